@@ -0,0 +1,21 @@
+import cddp
+import cddp.bench as bench
+import os
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+# scale factor of the synthetic data, e.g. CDDP_BENCH_SCALE=1000 pytest benchmarks/
+scale = int(os.getenv("CDDP_BENCH_SCALE", "10"))
+
+@pytest.fixture(scope="session")
+def create_spark():
+    if 'spark' not in globals():
+        globals()['spark'] = cddp.create_spark_session()
+    return globals()['spark']
+
+@pytest.mark.parametrize("config_path", bench.default_pipelines)
+def test_benchmark_pipeline(create_spark, benchmark, config_path):
+    report = benchmark.pedantic(bench.bench_pipeline, args=(create_spark, config_path, scale, './tmp/bench'), rounds=1, iterations=1)
+    benchmark.extra_info["report"] = report
+    assert len(report["tasks"]) > 0
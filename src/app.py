@@ -1,8 +1,10 @@
 import json
-import tempfile
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 import cddp
+import cddp.dataset as dataset
 import cddp.dbxapi as dbxapi
+import cddp.sandbox as sandbox
+import cddp.serialization as serialization
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -22,9 +24,40 @@ def show_pipeline_task_result():
     stage_name = post_data['stage']
     task_name = post_data['task']
     limit = post_data['limit']
+    format = post_data.get('format', 'records')
     print("app name: "+config["name"])
-    json, df = cddp.get_dataset_as_json(spark, config, stage_name, task_name, limit)
-    return jsonify(json)
+    result, df = cddp.get_dataset_as_json(spark, config, stage_name, task_name, limit, format,
+                                          columns=post_data.get('columns'),
+                                          offset=post_data.get('offset', 0),
+                                          filters=post_data.get('filters'),
+                                          order_by=post_data.get('order_by'),
+                                          cursor=post_data.get('cursor'))
+    if format == "arrow":
+        return Response(result, mimetype=serialization.arrow_mimetype)
+    return jsonify(result)
+
+@app.route('/api/pipeline/result/page', methods=['POST'])
+def show_pipeline_task_result_page():
+    post_data = request.get_json()
+    config = post_data['pipeline']
+    config['working_dir'] = post_data['working_dir']
+    format = post_data.get('format', 'records')
+    page = dataset.get_page(spark, config, post_data['stage'], post_data['task'],
+                            limit=post_data.get('limit', 20),
+                            offset=post_data.get('offset', 0),
+                            columns=post_data.get('columns'),
+                            filters=post_data.get('filters'),
+                            order_by=post_data.get('order_by'),
+                            cursor=post_data.get('cursor'),
+                            format=format)
+    if format == "arrow":
+        response = Response(page["data"], mimetype=serialization.arrow_mimetype)
+        if page["next_cursor"] is not None:
+            response.headers["X-Next-Cursor"] = page["next_cursor"]
+        if page["row_count_estimate"] is not None:
+            response.headers["X-Row-Count-Estimate"] = str(page["row_count_estimate"])
+        return response
+    return jsonify(page)
 
 @app.route('/api/pipeline/deploy', methods=['POST'])
 def deploy_pipeline():
@@ -53,74 +86,38 @@ def try_pipeline_standardization_task():
     task_name = post_data['task']
     timeout = post_data['timeout']
     limit = post_data['limit']
-
-    with tempfile.TemporaryDirectory() as tmpdir:
-        working_dir = tmpdir+"/"+config['name']
-        cddp.init(spark, config, working_dir)
-        cddp.clean_database(spark, config)
-        cddp.init_database(spark, config)
-
-    cddp.init_staging_sample_dataframe(spark, config)
-    
-    if 'standard' in config:
-        for task in config["standard"]:
-            if task_name == task['name']: 
-                print("start standardization task: "+task_name)
-                try:
-                    cddp.start_standard_job(spark, config, task, False, True, timeout)
-                    result, df = cddp.get_dataset_as_json(spark, config, "standard", task, limit)
-                    data_str = json.dumps(result)
-                    if not result:
-                        return jsonify({'error': 'Dataframe not found'}), 404
-                    return jsonify({"data": data_str})
-                except Exception as e:
-                    error = str(e)
-                    return jsonify({'error': error}), 500
-        
-    return jsonify({'status': 'error', 'message':'task not found'})
+    format = post_data.get('format', 'records')
+    return try_pipeline_task(config, "standard", task_name, timeout, limit, format)
 
 @app.route('/api/pipeline/serving/try', methods=['POST'])
 def try_pipeline_serving_task():
     post_data = request.get_json()
     config = post_data['pipeline']
-    if 'sample_data' in post_data:
-        sample_data = post_data['sample_data']
-    else:
-        sample_data = None
     task_name = post_data['task']
     timeout = post_data['timeout']
     limit = post_data['limit']
+    format = post_data.get('format', 'records')
+    return try_pipeline_task(config, "serving", task_name, timeout, limit, format)
 
-    with tempfile.TemporaryDirectory() as tmpdir:
-        working_dir = tmpdir+"/"+config['name']
-        config['landing_path'] = working_dir+"/landing/"
-        cddp.init(spark, config, working_dir)
-        cddp.clean_database(spark, config)
-        cddp.init_database(spark, config)
-    
-    cddp.init_staging_sample_dataframe(spark, config)
-    
-    if 'standard' in config:
-        for task in config["standard"]:
-                print("start standardization task: "+task['name'])
-                cddp.start_standard_job(spark, config, task, False, True, timeout)
-
-    if 'serving' in config:
-        for task in config["serving"]:
-            if task_name == task['name']: 
-                print("start serving task: "+task['name'])
-                try:
-                    cddp.start_serving_job(spark, config, task, False, True, timeout)
-                    result, df = cddp.get_dataset_as_json(spark, config, "serving", task, limit)
-                    data_str = json.dumps(result)
-                    if not result:
-                        return jsonify({'error': 'Dataframe not found'}), 404
-                    return jsonify({"data": data_str})
-                except Exception as e:
-                    error = str(e)
-                    return jsonify({'error': error}), 500
-
-    return jsonify({'status': 'error', 'message':'task not found'})
+def try_pipeline_task(config, stage, task_name, timeout, limit, format="records"):
+    # the sandbox of the pipeline keeps the staged sample data between
+    # requests and only rebuilds the tasks whose config changed
+    print(f"start {stage} task: "+task_name)
+    try:
+        sandbox_task = sandbox.run_task(spark, config, stage, task_name, timeout)
+        if sandbox_task is None:
+            return jsonify({'status': 'error', 'message':'task not found'})
+        session, task = sandbox_task
+        result, df = cddp.get_dataset_as_json(session, config, stage, task, limit, format)
+        if format == "arrow":
+            return Response(result, mimetype=serialization.arrow_mimetype)
+        data_str = json.dumps(result)
+        if not result:
+            return jsonify({'error': 'Dataframe not found'}), 404
+        return jsonify({"data": data_str})
+    except Exception as e:
+        error = str(e)
+        return jsonify({'error': error}), 500
 
 
 @app.route('/api/pipeline/staging/load_sample_data', methods=['POST'])
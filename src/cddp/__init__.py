@@ -1,21 +1,38 @@
 import json
 import os
+import re
+from pyspark import StorageLevel
 from pyspark.sql import SparkSession
+from pyspark.sql.functions import col, from_json
 from pyspark.sql.types import *
+import pandas as pd
 import shutil
 from delta import *
 from delta.tables import *
 import argparse
 import time
 import tempfile
+import urllib.parse
 import uuid
 
+import cddp.dataset as dataset
 import cddp.ingestion as cddp_ingestion
+import cddp.incremental as incremental
+import cddp.metrics as metrics
+import cddp.preflight as preflight
+import cddp.projection as projection
+import cddp.scheduler as scheduler
+import cddp.schema_resolver as schema_resolver
+import cddp.serialization as serialization
+import cddp.streaming as streaming
+import cddp.task_code as task_code
 import cddp.utils as utils
+import cddp.view_cache as view_cache
+import cddp.writer as writer
 
 
 
-storage_format = "delta"
+storage_format = writer.default_storage_format
 
 
 def create_spark_session():
@@ -23,6 +40,8 @@ def create_spark_session():
     builder = SparkSession.builder.appName("MyApp") \
         .config("spark.sql.extensions", "io.delta.sql.DeltaSparkSessionExtension") \
         .config("spark.sql.catalog.spark_catalog", "org.apache.spark.sql.delta.catalog.DeltaCatalog") \
+        .config("spark.scheduler.mode", "FAIR") \
+        .config("spark.sql.execution.arrow.pyspark.enabled", "true") \
         .config('spark.sql.warehouse.dir', './tmp/my-spark-warehouse') 
     spark = configure_spark_with_delta_pip(builder).getOrCreate()
     return spark
@@ -89,14 +108,28 @@ def init_database(spark, config):
         spark.sql(f"USE SCHEMA {app_name}")
 
 
+def get_local_warehouse_dir(spark):
+    """Returns the local folder of the warehouse of the session, None if it isn't on the local disk
+
+    Spark qualifies the warehouse dir when the session is created, so the
+    folder doesn't depend on the current dir of a later run, e.g. in the daemon.
+    """
+    warehouse_dir = spark.conf.get("spark.sql.warehouse.dir")
+    if warehouse_dir.startswith("file:"):
+        return urllib.parse.urlparse(warehouse_dir).path
+    if re.match(r"^[A-Za-z][A-Za-z0-9+.-]+:", warehouse_dir):
+        return None
+    return os.path.abspath(warehouse_dir)
+
+
 def clean_database(spark, config):
     app_name = config['name']
-    current_dir_path = os.path.dirname(os.path.realpath(__file__))
-    database_path = f"./tmp/my-spark-warehouse/{app_name}.db/"
+    warehouse_dir = get_local_warehouse_dir(spark)
+    database_path = f"{warehouse_dir}/{app_name}.db/" if warehouse_dir is not None else None
 
     if os.path.exists(config['app_data_path']):
         shutil.rmtree(config['app_data_path'], True)
-    if os.path.exists(database_path):
+    if database_path is not None and os.path.exists(database_path):
         #delete folder database_path
         print("delete path: "+database_path)
         shutil.rmtree(database_path, True)
@@ -114,50 +147,140 @@ def load_config(config_path):
 def output_dataset(spark, task, df, is_streaming, path, mode="append", timeout=None):
     output_type = task["output"]["type"]
     target = task["output"]["target"]
+    sinks = [sink for sink in ["table", "file"] if sink in output_type]
+    if len(sinks) > 0:
+        df = writer.prepare_dataframe(df, task)
     if is_streaming:
-        if "table" in output_type:
-
-            query = df.writeStream\
-                .format(storage_format) \
+        if len(sinks) > 1 or mode == "merge":
+            # a single query writes every micro-batch to all the sinks, so the
+            # source is read once and there is one checkpoint
+            batch_mode = get_batch_write_mode(mode)
+            checkpoint_location = path+"/chkpt/"+target
+            query_ids = []
+
+            def write_micro_batch(batch_df, batch_id):
+                # the delta transactions of the sinks are tracked per query, so a
+                # reset checkpoint doesn't skip the batches of the new query
+                if not query_ids:
+                    query_ids.append(streaming.get_query_id(spark, checkpoint_location))
+                write_batch_to_sinks(batch_df, task, path, batch_mode, True, batch_id, query_ids[0])
+
+            query = streaming.apply_trigger(df.writeStream, task) \
+                .outputMode("update" if mode == "merge" else mode) \
+                .option("checkpointLocation", checkpoint_location) \
+                .foreachBatch(write_micro_batch) \
+                .start()
+            streaming.register_query(query, task, timeout)
+        elif "table" in output_type:
+
+            query = writer.configure_writer(streaming.apply_trigger(df.writeStream, task), task) \
                 .outputMode(mode)\
                 .option("checkpointLocation", path+"/chkpt/"+target)\
                 .toTable(target)
-            if timeout is not None:
-                query.awaitTermination(timeout)
-                query.stop()
-        if "file" in output_type:
-            query = df.writeStream \
-                .format(storage_format) \
+            streaming.register_query(query, task, timeout)
+        elif "file" in output_type:
+            query = writer.configure_writer(streaming.apply_trigger(df.writeStream, task), task) \
                 .outputMode(mode) \
                 .option("checkpointLocation", path+"/chkpt/"+target)\
                 .start(path+"/data/"+target)
-            if timeout is not None:
-                query.awaitTermination(timeout)
-                query.stop()
+            streaming.register_query(query, task, timeout)
         if "view" in output_type:
-            df.createOrReplaceTempView(target)
+            view_cache.register_view(spark, task, df)
     else:
+        # persist once when the dataframe is written to several sinks or also
+        # read through the view, instead of recomputing its lineage each time
+        need_persist = len(sinks) > 1 or (len(sinks) > 0 and "view" in output_type)
+        persisted = need_persist and not df.is_cached
+        if persisted:
+            df.persist(StorageLevel.MEMORY_AND_DISK)
+        write_batch_to_sinks(df, task, path, mode)
+        optimize_sinks(spark, task, path)
+        if "view" in output_type:
+            print("create view: "+target)
+            view_cache.register_view(spark, task, df)
+            if persisted:
+                view_cache.track_persisted(spark, df)
+        elif persisted:
+            df.unpersist()
+
+
+def get_batch_write_mode(output_mode):
+    """Maps a streaming output mode to the write mode of a micro-batch"""
+    if output_mode == "complete":
+        return "overwrite"
+    if output_mode == "merge":
+        return "merge"
+    return "append"
+
+
+def get_batch_writer(df, task, sink, batch_id=None, query_id=None):
+    """Returns the writer of a batch, idempotent for the delta micro-batches of a streaming query
+
+    A micro-batch replayed after a restart has the same batch id, and delta
+    skips the write if it already committed that txnVersion for the query
+    and the sink.
+    """
+    batch_writer = writer.configure_writer(df.write, task)
+    if batch_id is not None and query_id is not None and writer.get_storage_format(task) == "delta":
+        batch_writer = batch_writer \
+            .option("txnAppId", f"cddp_{query_id}_{sink}") \
+            .option("txnVersion", batch_id)
+    return batch_writer
+
+
+def write_batch_to_sinks(df, task, path, mode, persist=False, batch_id=None, query_id=None):
+    output_type = task["output"]["type"]
+    target = task["output"]["target"]
+    if persist:
+        df.persist(StorageLevel.MEMORY_AND_DISK)
+    try:
+        # a replayed merge upserts the same rows again, and leaves the same result
         if "table" in output_type:
-            df.write.format(storage_format).mode(mode).option(
-                "overwriteSchema", "true").saveAsTable(target)
+            if mode == "merge":
+                writer.merge_dataframe(df, task, table_name=target)
+            else:
+                get_batch_writer(df, task, "table", batch_id, query_id).mode(mode).saveAsTable(target)
         if "file" in output_type:
             print("save file: "+path+"/data/"+target)
-            df.write.format(storage_format).mode(mode).option(
-                "overwriteSchema", "true").save(path+"/data/"+target)
-        if "view" in output_type:
-            print("create view: "+target)
-            df.createOrReplaceTempView(target)
+            if mode == "merge":
+                writer.merge_dataframe(df, task, path=path+"/data/"+target)
+            else:
+                get_batch_writer(df, task, "file", batch_id, query_id).mode(mode).save(path+"/data/"+target)
+    finally:
+        if persist:
+            df.unpersist()
 
 
+def optimize_sinks(spark, task, path):
+    output_type = task["output"]["type"]
+    target = task["output"]["target"]
+    if "table" in output_type:
+        writer.optimize_output(spark, task, table_name=target)
+    if "file" in output_type:
+        writer.optimize_output(spark, task, path=path+"/data/"+target)
+
+
+@metrics.instrument("staging")
 def start_staging_job(spark, config, task, timeout=None):
     """Creates the staging job"""
     print(f"Starting staging job for {task['name']}\n{json.dumps(task)}")
     staging_path = config["staging_path"]
-    df, is_streaming = cddp_ingestion.start_ingestion_task(task, spark)
-    output_dataset(spark, task, df, is_streaming, staging_path, "append", timeout)
+    if incremental.is_incremental(task):
+        df, is_streaming, pending_state = incremental.start_ingestion_task(spark, config, task)
+        if len(df.columns) == 0:
+            # no new files, and no schema to read them with
+            print(f"No new data for {task['name']}, its output isn't written")
+        else:
+            output_dataset(spark, task, df, is_streaming, staging_path, "append", timeout)
+        incremental.commit_increment(config, task, pending_state)
+    else:
+        df, is_streaming = cddp_ingestion.start_ingestion_task(task, spark, config=config)
+        df = projection.apply_projection(spark, config, task, df)
+        output_dataset(spark, task, df, is_streaming, staging_path, "append", timeout)
     return df
 
 
+@metrics.instrument("standard")
 def start_standard_job(spark, config, task, need_load_views=True, test_mode=False, timeout=None):
     """Creates the standard job"""
     print(f"Starting standard job for {task['name']}\n{json.dumps(task)}")
@@ -172,10 +295,12 @@ def start_standard_job(spark, config, task, need_load_views=True, test_mode=Fals
     if task["type"]=="streaming":
         is_streaming = True
     
-    output_dataset(spark, task, df, is_streaming, standard_path, "append", timeout)
+    mode = task["output"].get("mode", "append")
+    output_dataset(spark, task, df, is_streaming, standard_path, mode, timeout)
     return df
 
 
+@metrics.instrument("serving")
 def start_serving_job(spark, config, task, need_load_views=True, test_mode=False, timeout=None):
     """Creates the serving job"""
     print(f"Starting serving job for {task['name']}\n{json.dumps(task)}")
@@ -187,21 +312,31 @@ def start_serving_job(spark, config, task, need_load_views=True, test_mode=False
    
     df = run_task_code(spark, task)
     if task["type"]=="streaming" and not test_mode:
-        output_dataset(spark, task, df, True, serving_path, "complete", timeout)
-    else:
+        mode = task["output"].get("mode", "complete")
+        output_dataset(spark, task, df, True, serving_path, mode, timeout)
+    elif task["type"]=="streaming":
         output_dataset(spark, task, df, False, serving_path, "overwrite", timeout)
+    else:
+        mode = task["output"].get("mode", "overwrite")
+        output_dataset(spark, task, df, False, serving_path, mode, timeout)
     return df
     
 
+def start_job(spark, config, stage, task, need_load_views=True, timeout=None):
+    """Starts the job of a task of any stage"""
+    if stage == "staging":
+        return start_staging_job(spark, config, task, timeout)
+    elif stage == "standard":
+        return start_standard_job(spark, config, task, need_load_views, False, timeout)
+    elif stage == "serving":
+        return start_serving_job(spark, config, task, need_load_views, False, timeout)
+    else:
+        raise Exception("Invalid stage: " + stage)
+
+
 def run_task_code(spark, task):
     if task['code']['lang'] == "python" and "python" in task['code']:
-        python_code = task['code']["python"]
-        if (isinstance(python_code, list)):
-            python_code = " \n".join(python_code)
-        
-        python_code+=f"\n\noutput_df.createOrReplaceTempView('__{task['name']}_code_output__')"
-        exec(python_code)
-        df = spark.sql(f"select * from __{task['name']}_code_output__")
+        df = task_code.run_python_code(spark, task)
     elif task['code']['lang'] == "sql" and "sql" in task['code']:
         sql = task['code']["sql"]
         if (isinstance(sql, list)):
@@ -214,10 +349,15 @@ def load_staging_views(spark, config):
     if 'staging' in config:
         for task in config["staging"]:
             output_type = task["output"]["type"]
-            target = task["output"]["target"]
             if "view" in output_type:
-                df, is_streaming = cddp_ingestion.start_ingestion_task(task, spark)
-                df.createOrReplaceTempView(target)
+                with view_cache.get_task_lock(spark, task):
+                    if view_cache.is_registered(spark, task):
+                        continue
+                    if incremental.is_incremental(task):
+                        df = incremental.load_last_increment(spark, config, task)
+                    else:
+                        df, is_streaming = cddp_ingestion.start_ingestion_task(task, spark, config=config)
+                    view_cache.register_view(spark, task, projection.apply_projection(spark, config, task, df))
 
 
 def load_standard_views(spark, config):
@@ -225,10 +365,11 @@ def load_standard_views(spark, config):
     if 'standard' in config:
         for task in config["standard"]:
             output_type = task["output"]["type"]
-            target = task["output"]["target"]
             if "view" in output_type:
-                df =  start_standard_job(spark, config, task)
-                df.createOrReplaceTempView(target)
+                with view_cache.get_task_lock(spark, task):
+                    if view_cache.is_registered(spark, task):
+                        continue
+                    start_standard_job(spark, config, task)
 
 
 
@@ -236,46 +377,24 @@ def show_serving_dataset(spark, config, task):
     """Shows the serving dataset"""
     serving_path = f"{config['working-dir']}/{config['name']}/srv"
     target = task["target"]
-    df = spark.read.format(storage_format).load(serving_path+"/"+target)
+    df = spark.read.format(writer.get_storage_format(task)).load(serving_path+"/"+target)
     df.show()
 
 
-def get_dataset_as_json(spark, config, stage, task, limit=20):
-    """Shows the serving dataset"""
-    staging_path = f"{config['working_dir']}/{config['name']}/stg/data"
-    standard_path = f"{config['working_dir']}/{config['name']}/std/data"
-    serving_path = f"{config['working_dir']}/{config['name']}/srv/data"
-    task_output = task["output"]["type"]
-    target = task["output"]["target"]
-    app_name = config["name"]
-    if utils.is_running_on_synapse(spark):
-        spark.sql(f"USE {app_name}")
-    else:
-        spark.sql(f"USE SCHEMA {app_name}")
-    if "view" in task_output:        
-        df = spark.sql("select * from "+target+" limit "+str(limit))
-
-    elif "table" in task_output:        
-        df = spark.sql("select * from "+target+" limit "+str(limit))
-        
-    elif "file" in task_output:        
-        path = None
-        if stage == "staging":
-            path = staging_path
-        elif stage == "standard":
-            path = standard_path
-        elif stage == "serving":
-            path = serving_path
-        else:
-            raise Exception("Invalid stage")
-        df = spark.read.format(storage_format).load(path+"/"+target)
-        df.createOrReplaceTempView("tmp_"+target)
-        df = spark.sql("select * from tmp_"+target + " limit "+str(limit))
-        
-    else:
-        raise Exception("Invalid output")
-    
-    result = df.toJSON().map(lambda j: json.loads(j)).collect()
+def get_dataset_as_json(spark, config, stage, task, limit=20, format="records", columns=None, offset=0, filters=None, order_by=None, cursor=None):
+    """Returns the rows of the output of a task and their dataframe
+
+    The columns, filters, order_by and cursor are applied in the query, see
+    dataset.query_dataframe. The rows are collected with Arrow and returned
+    in the result format (records, columns or arrow), see
+    serialization.serialize_dataframe.
+    """
+    df = dataset.load_task_output(spark, config, stage, task)
+    df = dataset.query_dataframe(df, columns, filters, order_by, cursor)
+    if columns:
+        df = df.select(*columns)
+    df = df.limit(offset + limit)
+    result = serialization.serialize_dataframe(df, format, offset)
     return result, df
 
 
@@ -298,6 +417,14 @@ def entrypoint():
                         help='how many seconds to wait before streaming job terminating, no specified means not terminating.', required=False)
     parser.add_argument('--cleanup-database', action='store_true',
                         help='Clean up existing database', required=False)
+    parser.add_argument('--parallelism', type=int, default=1,
+                        help='how many independent tasks to run at the same time, the default value is 1', required=False)
+    parser.add_argument('--skip-preflight', action='store_true',
+                        help='skip the analysis of the task code against the declared schemas before running', required=False)
+    parser.add_argument('--dry-run', action='store_true',
+                        help='print the schema and execution plan of every task without reading or writing any data', required=False)
+    parser.add_argument('--daemon', action='store_true',
+                        help='run the pipeline in the warm Spark session of the cddp daemon, started with python -m cddp.daemon', required=False)
 
     args = parser.parse_args()
 
@@ -310,6 +437,27 @@ def entrypoint():
     show_result = args.show_result
     build_landing_zone = args.build_landing_zone
     cleanup_database = args.cleanup_database
+    parallelism = args.parallelism
+    run_preflight = not args.skip_preflight
+    dry_run = args.dry_run
+
+    if args.daemon:
+        # imported here as cddp.daemon imports cddp
+        import cddp.daemon as daemon
+        daemon.submit({
+            "config_path": config_path,
+            "working_dir": working_dir,
+            "stage_arg": stage_arg,
+            "task_arg": task_arg,
+            "show_result": show_result,
+            "build_landing_zone": build_landing_zone,
+            "awaitTermination": awaitTermination,
+            "cleanup_database": cleanup_database,
+            "parallelism": parallelism,
+            "run_preflight": run_preflight,
+            "dry_run": dry_run
+        })
+        return
 
     if 'spark' not in globals():
         spark = create_spark_session()
@@ -317,10 +465,15 @@ def entrypoint():
     if utils.is_running_on_synapse(spark):
         _, config_path = setup_synapse(spark, config_path)
 
-    run_pipeline(spark, config_path, working_dir, stage_arg, task_arg, show_result, build_landing_zone, awaitTermination, cleanup_database)
+    run_pipeline(spark, config_path, working_dir, stage_arg, task_arg, show_result, build_landing_zone, awaitTermination, cleanup_database, parallelism, run_preflight, dry_run)
     
 
-def run_pipeline(spark, config_path, working_dir, stage_arg, task_arg, show_result, build_landing_zone, awaitTermination, cleanup_database):
+def run_pipeline(spark, config_path, working_dir, stage_arg, task_arg, show_result, build_landing_zone, awaitTermination, cleanup_database, parallelism=1, run_preflight=True, dry_run=False):
+    """Runs the pipeline, returns the serving dataframes when show_result is set
+
+    A dry run returns the preflight results of the tasks instead, with their
+    schema and execution plan, and doesn't touch the database or the data.
+    """
 
     config = load_config(config_path)
     # config['landing_path'] = landing_path
@@ -332,38 +485,64 @@ def run_pipeline(spark, config_path, working_dir, stage_arg, task_arg, show_resu
     stage: {stage_arg},
     task: {task_arg},   
     show_result: {show_result}, 
+    parallelism: {parallelism},
     streaming job waiting for {str(awaitTermination)} seconds before terminating
     """)
 
+    streaming.apply_streaming_defaults(config)
+    streaming.validate_streaming_config(config)
+
     init(spark, config, working_dir)
 
+    if dry_run:
+        results = preflight.analyze_pipeline(spark, config, stage_arg, task_arg, with_plans=True)
+        preflight.print_results(results)
+        preflight.check_results(results)
+        return results
+
     if cleanup_database:
         clean_database(spark, config)
 
     init_database(spark, config)
 
+    # unresolved tables and columns are reported before any data is read
+    if run_preflight:
+        preflight.run_preflight(spark, config, stage_arg, task_arg)
 
     if build_landing_zone:
         create_landing_zone(config)
 
-    if 'staging' in config and (stage_arg is None or stage_arg == "staging"):
-        for task in config["staging"]:
-            if task_arg is None or task['name'] == task_arg:
-                start_staging_job(spark, config, task, awaitTermination)
-    if 'standard' in config and (stage_arg is None or stage_arg == "standard"):
-        for task in config["standard"]:
-            if task_arg is None or task['name'] == task_arg:
-                start_standard_job(spark, config, task, True, False, awaitTermination)
-    
+    # views are only reloaded when a subset of the pipeline runs, otherwise
+    # the upstream tasks of the graph have registered them already
+    need_load_views = stage_arg is not None or task_arg is not None
+
+    def run_task(stage, task):
+        return start_job(spark, config, stage, task, need_load_views, awaitTermination)
+
+    graph = scheduler.build_task_graph(config, stage_arg, task_arg)
+    metrics_sink = metrics.create_sink(spark, config["metrics"]) if "metrics" in config else None
+    metrics.begin_run(metrics_sink)
+    # streaming queries of the run are started together and awaited at the end
+    streaming_run = streaming.begin_run()
+    try:
+        scheduler.run_task_graph(spark, graph, run_task, parallelism)
+        streaming.await_queries(run=streaming_run)
+    except BaseException:
+        streaming.stop_queries(streaming_run)
+        raise
+    finally:
+        metrics.record_streaming_queries(config, list(streaming_run["queries"]))
+        streaming.end_run(streaming_run)
+        metrics.end_run()
+        view_cache.release(spark)
+
     serving_df = []
-    if 'serving' in config and (stage_arg is None or stage_arg == "serving"):
+    if show_result and 'serving' in config and (stage_arg is None or stage_arg == "serving"):
         for task in config["serving"]:
             if task_arg is None or task['name'] == task_arg:
-                start_serving_job(spark, config, task, True, False, awaitTermination)
-                if show_result:
-                    json, df = get_dataset_as_json(spark, config, "serving", task)
-                    df.show()
-                    serving_df.append(df)
+                json, df = get_dataset_as_json(spark, config, "serving", task)
+                df.show()
+                serving_df.append(df)
     return serving_df
 
 
@@ -384,23 +563,17 @@ def load_sample_data(spark, data_str, format="json"):
     temp_file.write(data_str.encode())
     temp_file.close()
     file_path = temp_file.name
-    if format == "json":
-        # read json file to dataframe
-        df = spark \
-            .read \
-            .format("json") \
-            .option("header", "true") \
-            .option("inferSchema", "true") \
-            .option("multiline", "true") \
-            .load(temp_file.name)
-    elif format == "csv":
-        df = spark \
-            .read \
-            .format("csv") \
-            .option("header", "true") \
-            .option("inferSchema", "true") \
-            .option("multiline", "true") \
-            .load(file_path)
+    if format not in ["json", "csv"]:
+        raise Exception("Unsupported sample data format: " + format)
+    # the schema is inferred from the first rows only, and reused for the
+    # same data, so the file is read once
+    df = spark \
+        .read \
+        .format(format) \
+        .option("header", "true") \
+        .option("multiline", "true") \
+        .schema(schema_resolver.infer_data_schema(spark, data_str, format)) \
+        .load(file_path)
     # create random table name
     table_name = "tmp_"+str(uuid.uuid4()).replace("-", "")
     df.createOrReplaceTempView("tmp_"+table_name)
@@ -410,47 +583,74 @@ def load_sample_data(spark, data_str, format="json"):
     return json_str, schema
 
 
-def init_staging_sample_dataframe(spark, config):
-    staging_path = config["staging_path"]
+def init_staging_sample_dataframe(spark, config, in_memory=False):
     for task in config["staging"]:
         if 'sampleData' in task:
-            target = task["output"]["target"]
-            output = task["output"]["type"]
-            type = task["input"]["type"]
-            task_landing_path = utils.get_path_for_current_env(type,task["input"]["path"])
-            if not os.path.exists(task_landing_path):
-                os.makedirs(task_landing_path)
-            filename = task['name']+".json"
-            sampleData = task['sampleData']
-            with open(task_landing_path+"/"+filename, "w") as text_file:
-                json.dump(sampleData, text_file)
-            if(task["schema"]):
-                schema = StructType.fromJson(task["schema"])
-                df = spark \
-                    .read \
-                    .format("json") \
-                    .option("multiline", "true") \
-                    .option("header", "true") \
-                    .option("inferschema", "true")\
-                    .schema(schema) \
-                    .load(task_landing_path+"/"+filename)
-            else:
-                df = spark \
-                    .read \
-                    .format("json") \
-                    .option("multiline", "true") \
-                    .option("header", "true") \
-                    .option("inferschema", "true")\
-                    .load(task_landing_path+"/"+filename)
-
-            if "table" in output:
-                df.write.format(storage_format).mode("append").option(
-                    "overwriteSchema", "true").saveAsTable(target)
-            if "file" in output:
-                df.write.format(storage_format).mode("append").option(
-                    "overwriteSchema", "true").save(staging_path+"/"+target)
-            if "view" in output:
-                df.createOrReplaceTempView(target)
+            init_staging_sample_task(spark, config, task, in_memory)
+
+
+def init_staging_sample_task(spark, config, task, in_memory=False):
+    """Writes the sample data of a staging task to its outputs
+
+    In memory, the sample data is only registered as a cached view of the
+    task target, for preview and test runs.
+    """
+    if in_memory:
+        load_staging_sample_view(spark, task)
+        return
+    staging_path = config["staging_path"]
+    target = task["output"]["target"]
+    output = task["output"]["type"]
+    type = task["input"]["type"]
+    task_landing_path = utils.get_path_for_current_env(type,task["input"]["path"])
+    if not os.path.exists(task_landing_path):
+        os.makedirs(task_landing_path)
+    filename = task['name']+".json"
+    sampleData = task['sampleData']
+    with open(task_landing_path+"/"+filename, "w") as text_file:
+        json.dump(sampleData, text_file)
+    if task.get("schema"):
+        schema = StructType.fromJson(task["schema"])
+    else:
+        schema = schema_resolver.infer_data_schema(spark, json.dumps(sampleData), "json")
+    df = spark \
+        .read \
+        .format("json") \
+        .option("multiline", "true") \
+        .schema(schema) \
+        .load(task_landing_path+"/"+filename)
+
+    if "table" in output or "file" in output:
+        df = writer.prepare_dataframe(df, task)
+    if "table" in output:
+        writer.configure_writer(df.write, task).mode("append").saveAsTable(target)
+    if "file" in output:
+        writer.configure_writer(df.write, task).mode("append").save(staging_path+"/"+target)
+    if "view" in output:
+        df.createOrReplaceTempView(target)
+
+
+def load_staging_sample_view(spark, task):
+    """Registers the sample data of a staging task as a cached view, without writing any file"""
+    target = task["output"]["target"]
+    rows = pd.DataFrame({"value": [json.dumps(row) for row in task["sampleData"]]})
+    # the rows are parsed from JSON like the sample data files are read, so
+    # strings are converted to the declared timestamp and numeric types
+    json_df = spark.createDataFrame(rows)
+    if task.get("schema"):
+        schema = StructType.fromJson(task["schema"])
+    else:
+        schema = schema_resolver.infer_data_schema(spark, json.dumps(task["sampleData"]), "json")
+    df = json_df.select(from_json(col("value"), schema).alias("row")).select("row.*")
+    try:
+        spark.catalog.uncacheTable(target)
+    except Exception:
+        pass
+    df = df.cache()
+    view_cache.track_persisted(spark, df)
+    view_cache.replace_view_df(spark, target, df)
+    df.createOrReplaceTempView(target)
+    return df
 
 def create_landing_zone(config):
     for task in config["staging"]:
@@ -0,0 +1,180 @@
+"""Benchmarks the example pipelines against synthetic data in local mode
+
+    python -m cddp.bench --scale 100 --output bench.json
+
+The sample data of each filestore staging task is replicated `scale` times
+into a landing folder of the working dir. Then every task of the pipeline
+runs in dependency order. The JSON report has the wall time, output rows and
+shuffle bytes of each task, the rows/s of each stage and the peak driver
+memory, so results can be compared between cddp releases.
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import time
+
+import cddp
+import cddp.metrics as metrics
+import cddp.scheduler as scheduler
+import cddp.streaming as streaming
+import cddp.utils as utils
+import cddp.view_cache as view_cache
+import cddp.writer as writer
+
+
+default_pipelines = [
+    "./example/pipeline_fruit_batch.json",
+    "./example/pipeline_fruit_streaming.json",
+    "./example/pipeline_nyc_taxi_new.json",
+    "./example/pipeline_parking_sensors.json"
+]
+
+# number of sample data copies per landed file
+copies_per_file = 100
+
+
+def build_synthetic_landing(config, scale, landing_dir):
+    """Writes the sample data of each filestore staging task scaled up `scale` times, and points the tasks to it"""
+    for task in config["staging"]:
+        if task["input"]["type"] != "filestore" or not task.get("sampleData"):
+            continue
+        task_landing_path = f"{landing_dir}/{task['name']}"
+        os.makedirs(task_landing_path, exist_ok=True)
+        format = task["input"]["format"]
+        for file_index in range(0, scale, copies_per_file):
+            copies = min(copies_per_file, scale - file_index)
+            data = task["sampleData"] * copies
+            if format == "csv":
+                utils.json_to_csv(data, f"{task_landing_path}/{file_index:08d}.csv")
+            elif format == "json":
+                with open(f"{task_landing_path}/{file_index:08d}.json", "w") as f:
+                    json.dump(data, f)
+            else:
+                raise Exception("Unsupported landing format for benchmark: " + format)
+        task["input"]["path"] = task_landing_path
+    # streaming tasks process the whole landed data and terminate
+    if any(task.get("type") == "streaming" for task in config.get("standard", []) + config.get("serving", [])) \
+            or any(task["input"].get("read-type") == "streaming" for task in config["staging"]):
+        config["streaming"] = {"trigger": {"availableNow": True}}
+        streaming.apply_streaming_defaults(config)
+
+
+def get_peak_driver_memory(spark):
+    """Returns the peak JVM heap of the driver and the peak RSS of the python driver process"""
+    peak_jvm_heap = None
+    executors = metrics.get_spark_rest(spark, "executors")
+    if executors is not None:
+        for executor in executors:
+            if executor["id"] == "driver" and "peakMemoryMetrics" in executor:
+                peak_jvm_heap = executor["peakMemoryMetrics"].get("JVMHeapMemory")
+    return {
+        "jvm_heap_bytes": peak_jvm_heap,
+        "python_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    }
+
+
+def count_output_rows(spark, config, stage, task):
+    """Counts the rows of the task output, None if the output can't be read back"""
+    output_type = task["output"]["type"]
+    target = task["output"]["target"]
+    stage_path = {"staging": config["staging_path"], "standard": config["standard_path"], "serving": config["serving_path"]}[stage]
+    try:
+        if "table" in output_type:
+            return spark.table(target).count()
+        if "file" in output_type:
+            return spark.read.format(writer.get_storage_format(task)).load(stage_path+"/data/"+target).count()
+        df = spark.table(target)
+        if not df.isStreaming:
+            return df.count()
+    except Exception as e:
+        print(f"[bench] cannot count the output rows of {task['name']}: {e}")
+    return None
+
+
+def bench_pipeline(spark, config_path, scale, working_dir):
+    """Runs one pipeline against synthetic data and returns its benchmark report"""
+    config = cddp.load_config(config_path)
+    pipeline_dir = f"{working_dir}/{config['name']}_bench"
+    if os.path.exists(pipeline_dir):
+        shutil.rmtree(pipeline_dir, True)
+    build_synthetic_landing(config, scale, f"{pipeline_dir}/landing")
+    cddp.init(spark, config, pipeline_dir)
+    cddp.clean_database(spark, config)
+    cddp.init_database(spark, config)
+
+    graph = scheduler.build_task_graph(config)
+    tasks = []
+    # the task metrics give the shuffle bytes of the Spark jobs of each task
+    metrics_sink = metrics.MemorySink()
+    metrics.begin_run(metrics_sink)
+    streaming_run = streaming.begin_run()
+    try:
+        for (stage, name), node in graph.items():
+            start_time = time.time()
+            cddp.start_job(spark, config, stage, node["task"], False)
+            # streaming tasks run with the availableNow trigger until the landed data is processed
+            streaming.await_queries(0.1, streaming_run)
+            wall_time = time.time() - start_time
+            tasks.append({
+                "stage": stage,
+                "name": name,
+                "wall_time": wall_time,
+                "rows": count_output_rows(spark, config, stage, node["task"]),
+                "shuffle_bytes": metrics_sink.records[-1].get("shuffle_bytes")
+            })
+    finally:
+        streaming.end_run(streaming_run)
+        metrics.end_run()
+        view_cache.release(spark)
+
+    stages = {}
+    for task in tasks:
+        stage = stages.setdefault(task["stage"], {"wall_time": 0, "rows": 0})
+        stage["wall_time"] += task["wall_time"]
+        stage["rows"] += task["rows"] or 0
+        task["rows_per_sec"] = (task["rows"] or 0) / task["wall_time"] if task["wall_time"] > 0 else None
+    for stage in stages.values():
+        stage["rows_per_sec"] = stage["rows"] / stage["wall_time"] if stage["wall_time"] > 0 else None
+
+    return {
+        "name": config["name"],
+        "config_path": config_path,
+        "scale": scale,
+        "tasks": tasks,
+        "stages": stages,
+        "peak_driver_memory": get_peak_driver_memory(spark)
+    }
+
+
+def run_benchmarks(spark, config_paths, scale, working_dir):
+    return {
+        "spark_version": spark.version,
+        "scale": scale,
+        "pipelines": [bench_pipeline(spark, config_path, scale, working_dir) for config_path in config_paths]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark data pipelines with synthetic data')
+    parser.add_argument('--config-path', action='append',
+                        help='path to pipeline config file, can be repeated, the default value is the example pipelines', required=False)
+    parser.add_argument('--scale', type=int, default=10,
+                        help='how many times the sample data of each staging task is replicated', required=False)
+    parser.add_argument('--working-dir', default='./tmp/bench',
+                        help='folder to store the synthetic landing data and the pipeline data', required=False)
+    parser.add_argument('--output', help='path of the JSON report, the default is to print it', required=False)
+    args = parser.parse_args()
+
+    spark = cddp.create_spark_session()
+    report = run_benchmarks(spark, args.config_path or default_pipelines, args.scale, args.working_dir)
+    report_str = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report_str)
+    print(report_str)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Keeps a warm Spark session to run pipelines submitted from the CLI
+
+    python -m cddp.daemon                 # starts the daemon
+    python src/main.py --daemon ...       # runs the pipeline in the daemon
+
+The daemon listens on a localhost port and writes the port and an access
+token to a state file readable by the current user only. Each request is a
+JSON line with the token and the run_pipeline arguments. Requests run one at
+a time in a new session of the warm Spark session, so the JVM, the Delta
+jars and the catalog are only loaded once, while temp views don't leak
+between runs. The response has the printed output of the run.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import secrets
+import socket
+import socketserver
+import traceback
+
+import cddp
+
+
+default_state_path = os.path.join(os.path.expanduser("~"), ".cddp", "daemon.json")
+run_args = ["config_path", "working_dir", "stage_arg", "task_arg", "show_result", "build_landing_zone",
+            "awaitTermination", "cleanup_database", "parallelism", "run_preflight", "dry_run"]
+
+
+def write_state(state_path, state):
+    os.makedirs(os.path.dirname(state_path), exist_ok=True)
+    fd = os.open(state_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        json.dump(state, f)
+
+
+def read_state(state_path=default_state_path):
+    """Returns the port and token of the running daemon, None if there is no daemon"""
+    if not os.path.exists(state_path):
+        return None
+    with open(state_path, "r") as f:
+        return json.load(f)
+
+
+def handle_request(spark, request):
+    """Runs a daemon request and returns its response"""
+    command = request.get("command")
+    if command == "ping":
+        return {"status": "ok"}
+    if command != "run":
+        raise Exception("Unknown daemon command: " + str(command))
+    args = request["args"]
+    unknown = set(args.keys()) - set(run_args)
+    if unknown:
+        raise Exception(f"Unknown run arguments: {sorted(unknown)}")
+    output = io.StringIO()
+    status = "ok"
+    daemon_cwd = os.getcwd()
+    with contextlib.redirect_stdout(output):
+        try:
+            # the relative paths of the config are relative to the client cwd
+            os.chdir(request.get("cwd", daemon_cwd))
+            cddp.run_pipeline(spark.newSession(), **args)
+        except Exception:
+            traceback.print_exc(file=output)
+            status = "error"
+        finally:
+            os.chdir(daemon_cwd)
+    return {"status": status, "output": output.getvalue()}
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        server = self.server
+        try:
+            request = json.loads(self.rfile.readline())
+            if not secrets.compare_digest(str(request.get("token", "")), server.token):
+                raise Exception("Invalid daemon token")
+            if request.get("command") == "shutdown":
+                response = {"status": "ok"}
+                server.stopping = True
+            else:
+                response = handle_request(server.spark, request)
+        except Exception as e:
+            response = {"status": "error", "output": str(e)}
+        self.wfile.write((json.dumps(response) + "\n").encode())
+
+
+def serve(port=0, state_path=default_state_path):
+    """Starts the warm Spark session and serves requests until a shutdown request"""
+    spark = cddp.create_spark_session()
+    with socketserver.TCPServer(("127.0.0.1", port), RequestHandler) as server:
+        server.spark = spark
+        server.token = secrets.token_hex(16)
+        server.stopping = False
+        write_state(state_path, {"port": server.server_address[1], "token": server.token, "pid": os.getpid()})
+        print(f"[daemon] listening on 127.0.0.1:{server.server_address[1]}")
+        try:
+            while not server.stopping:
+                server.handle_request()
+        finally:
+            os.remove(state_path)
+
+
+def send_request(request, state_path=default_state_path, timeout=None):
+    """Sends a request to the running daemon and returns its response"""
+    state = read_state(state_path)
+    if state is None:
+        raise Exception("No cddp daemon is running, start it with python -m cddp.daemon")
+    request = dict(request, token=state["token"])
+    with socket.create_connection(("127.0.0.1", state["port"]), timeout=timeout) as sock:
+        sock.sendall((json.dumps(request) + "\n").encode())
+        with sock.makefile("r") as f:
+            return json.loads(f.readline())
+
+
+def submit(args, state_path=default_state_path):
+    """Runs a pipeline in the daemon from the current working dir"""
+    response = send_request({"command": "run", "args": args, "cwd": os.getcwd()}, state_path)
+    print(response.get("output", ""), end="")
+    if response["status"] != "ok":
+        raise Exception("The pipeline run failed in the cddp daemon")
+    return response
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Keep a warm Spark session to run pipelines from the CLI')
+    parser.add_argument('--port', type=int, default=0,
+                        help='localhost port to listen on, the default value is any free port', required=False)
+    parser.add_argument('--state-path', default=default_state_path,
+                        help='file to write the port and access token to', required=False)
+    parser.add_argument('--stop', action='store_true',
+                        help='stop the running daemon', required=False)
+    args = parser.parse_args()
+    if args.stop:
+        send_request({"command": "shutdown"}, args.state_path)
+    else:
+        serve(args.port, args.state_path)
+
+
+if __name__ == "__main__":
+    main()
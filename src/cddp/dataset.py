@@ -0,0 +1,152 @@
+import base64
+import json
+from functools import reduce
+from pyspark.sql import DataFrame
+from pyspark.sql.functions import col, from_json, sum as sum_
+import cddp.serialization as serialization
+import cddp.utils as utils
+import cddp.writer as writer
+
+
+filter_ops = {
+    "=": lambda c, v: c == v,
+    "!=": lambda c, v: c != v,
+    "<": lambda c, v: c < v,
+    "<=": lambda c, v: c <= v,
+    ">": lambda c, v: c > v,
+    ">=": lambda c, v: c >= v,
+    "in": lambda c, v: c.isin(v),
+    "like": lambda c, v: c.like(v),
+    "is_null": lambda c, v: c.isNull(),
+    "not_null": lambda c, v: c.isNotNull()
+}
+
+
+def get_output_path(config, stage, task):
+    stage_folder = {"staging": "stg", "standard": "std", "serving": "srv"}
+    if stage not in stage_folder:
+        raise Exception("Invalid stage")
+    return f"{config['working_dir']}/{config['name']}/{stage_folder[stage]}/data/{task['output']['target']}"
+
+
+def load_task_output(spark, config, stage, task):
+    """Returns the dataframe of the output of a task, read from its view, table or files"""
+    task_output = task["output"]["type"]
+    target = task["output"]["target"]
+    app_name = config["name"]
+    if utils.is_running_on_synapse(spark):
+        spark.sql(f"USE {app_name}")
+    else:
+        spark.sql(f"USE SCHEMA {app_name}")
+    if "view" in task_output or "table" in task_output:
+        return spark.table(target)
+    elif "file" in task_output:
+        return spark.read.format(writer.get_storage_format(task)).load(get_output_path(config, stage, task))
+    else:
+        raise Exception("Invalid output")
+
+
+def parse_order_by(order_by):
+    """Parses ["col", "col desc"] into a list of (column, descending)"""
+    parsed = []
+    for item in order_by or []:
+        parts = item.split()
+        if len(parts) == 1 or len(parts) == 2 and parts[1].lower() in ["asc", "desc"]:
+            parsed.append((parts[0], len(parts) == 2 and parts[1].lower() == "desc"))
+        else:
+            raise Exception(f"Invalid order by {item}, expecting 'column [asc|desc]'")
+    return parsed
+
+
+def get_filter_condition(filter):
+    """Converts a filter, e.g. {"column": "price", "op": ">", "value": 10}, to a column condition"""
+    if filter.get("op") not in filter_ops:
+        raise Exception(f"Invalid filter op {filter.get('op')}, expecting one of {list(filter_ops.keys())}")
+    return filter_ops[filter["op"]](col(filter["column"]), filter.get("value"))
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).decode()
+
+
+def decode_cursor(cursor):
+    return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+
+
+def get_cursor_condition(order_by, values):
+    """Returns the condition of the rows after the cursor row in the sort order (keyset paging)"""
+    conditions = []
+    for i, (name, descending) in enumerate(order_by):
+        after = col(name) < values[i] if descending else col(name) > values[i]
+        equal = [col(prev_name) == values[j] for j, (prev_name, _) in enumerate(order_by[:i])]
+        conditions.append(reduce(lambda a, b: a & b, equal + [after]))
+    return reduce(lambda a, b: a | b, conditions)
+
+
+def query_dataframe(df, columns=None, filters=None, order_by=None, cursor=None):
+    """Applies the filters, sort order, cursor and column projection of a preview
+
+    Filters and the projection are plain dataframe operations, so Spark
+    pushes them down to the files of the output.
+    """
+    parsed_order_by = parse_order_by(order_by)
+    for filter in filters or []:
+        df = df.where(get_filter_condition(filter))
+    if cursor is not None:
+        if not parsed_order_by:
+            raise Exception("A cursor needs an order by")
+        df = df.where(get_cursor_condition(parsed_order_by, decode_cursor(cursor)))
+    if parsed_order_by:
+        df = df.orderBy(*[col(name).desc() if descending else col(name).asc() for name, descending in parsed_order_by])
+    if columns:
+        missing = [name for name in columns if name not in df.columns]
+        if missing:
+            raise Exception(f"Unknown columns: {missing}")
+        # the sort columns are kept for the cursor and dropped after the collect
+        df = df.select(*(columns + [name for name, _ in parsed_order_by if name not in columns]))
+    return df
+
+
+def get_page(spark, config, stage, task, limit=20, offset=0, columns=None, filters=None, order_by=None, cursor=None, format="records"):
+    """Returns a page of the output of a task with the cursor of the next page and a row count estimate
+
+    offset skips rows on the driver, a cursor, which needs order_by, skips
+    them in the query and is the way to page through large outputs.
+    """
+    df = query_dataframe(load_task_output(spark, config, stage, task), columns, filters, order_by, cursor)
+    table = serialization.collect_as_arrow(df.limit(offset + limit)).slice(offset)
+    next_cursor = None
+    parsed_order_by = parse_order_by(order_by)
+    if parsed_order_by and table.num_rows == limit:
+        last_row = table.slice(table.num_rows - 1).to_pylist()[0]
+        next_cursor = encode_cursor([last_row[name] for name, _ in parsed_order_by])
+    if columns:
+        table = table.select(columns)
+    return {
+        "data": serialization.serialize_table(table, format),
+        "next_cursor": next_cursor,
+        "row_count_estimate": estimate_row_count(spark, config, stage, task) if not filters else None
+    }
+
+
+def estimate_row_count(spark, config, stage, task):
+    """Sums the numRecords stats of the files of a delta output, None if the output has no stats"""
+    task_output = task["output"]["type"]
+    if writer.get_storage_format(task) != "delta" or not ("table" in task_output or "file" in task_output):
+        return None
+    try:
+        if "table" in task_output:
+            location = spark.sql(f"DESCRIBE DETAIL {task['output']['target']}").collect()[0]["location"]
+        else:
+            location = get_output_path(config, stage, task)
+        delta_log = spark._jvm.org.apache.spark.sql.delta.DeltaLog.forTable(spark._jsparkSession, location)
+        files = DataFrame(delta_log.update(False).allFiles().toDF(), spark)
+        stats = files.select(from_json(col("stats"), "numRecords long").alias("stats"))
+        row = stats.agg(sum_(col("stats.numRecords")).alias("rows"),
+                        sum_(col("stats.numRecords").isNull().cast("int")).alias("missing")).collect()[0]
+        if row["missing"]:
+            return None
+        return row["rows"] or 0
+    except Exception as e:
+        print(f"Cannot estimate the row count of {task['name']}: {e}")
+        return None
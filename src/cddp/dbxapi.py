@@ -4,6 +4,8 @@ from databricks_cli.dbfs.api import DbfsApi, DbfsPath
 import json
 import os
 import tempfile
+import cddp.scheduler as scheduler
+import cddp.streaming as streaming
 import cddp.utils as utils
 from dotenv import load_dotenv
 load_dotenv()
@@ -80,56 +82,50 @@ def build_workflow_json(config, job_name, working_dir):
     return body
 
 def build_tasks(config, working_dir, config_path, dbx_cluster):
-    tasks = []
-    standard_gate = create_stage_gate_task("standard", dbx_cluster)
-    serving_gate = create_stage_gate_task("serving", dbx_cluster)
-    serving_gate["depends_on"].append({"task_key": standard_gate["task_key"]})
-    tasks.append(standard_gate)
-    tasks.append(serving_gate)
-    for task in config["staging"]:
-        type = task["input"]["type"]
-        if type == "filestore":
-            mode = task["input"]["read-type"]
-        elif type == "azure_adls_gen2":
-            mode = task["input"]["read-type"]
-        name = task["name"]
-        output = task["output"]["type"]
-        if 'table' in output or 'file' in output:
-            task_obj = create_task("staging", name, working_dir, config_path, dbx_cluster)            
-            if mode == "batch":
-                standard_gate["depends_on"].append({"task_key": name})
-            tasks.append(task_obj)
+    """Builds the workflow tasks with the dependencies of the pipeline task graph
 
-    for task in config["standard"]:
-        type = task["type"]
-        name = task['name']
-        output_type = task["output"]["type"]
-        dependency = task["dependency"]
-        if 'table' in output_type or 'file' in output_type:
-            task_obj = create_task("standard", name, working_dir, config_path, dbx_cluster)            
-            if type == "batch":
-                serving_gate["depends_on"].append({"task_key": name})
-            task_obj["depends_on"].append({"task_key": standard_gate["task_key"]})
-            tasks.append(task_obj)
-            for dep in dependency:
-                for std_conf in config["standard"]:
-                    if(std_conf["name"] == dep and std_conf["type"] == "batch"):
-                        task_obj["depends_on"].append({"task_key": dep})
-    
-    for task in config["serving"]:
-        type = task["type"]
-        name = task['name']
-        dependency = task["dependency"]
-        task_obj = create_task("serving", name, working_dir, config_path, dbx_cluster)            
-        task_obj["depends_on"].append({"task_key": serving_gate["task_key"]})
+    Only the tasks writing a table or files are deployed, the view-only tasks
+    are recomputed by the tasks reading them, so their dependencies are
+    taken instead. Streaming tasks never finish, so nothing waits on them.
+    """
+    graph = scheduler.build_task_graph(config)
+    deployed = dict((key, node) for key, node in graph.items()
+                    if is_deployed(node["stage"], node["task"]))
+    tasks = []
+    for key, node in deployed.items():
+        stage, name = key
+        task_obj = create_task(stage, name, working_dir, config_path, dbx_cluster)
+        for dep in sorted(get_deployed_dependencies(graph, deployed, key)):
+            task_obj["depends_on"].append({"task_key": dep[1]})
         tasks.append(task_obj)
-        for dep in dependency:
-            for srv_conf in config["serving"]:
-                if(srv_conf["name"] == dep and srv_conf["type"] == "batch"):
-                    task_obj["depends_on"].append({"task_key": dep})
-
     return tasks
 
+def is_deployed(stage, task):
+    output_type = task["output"]["type"]
+    return stage == "serving" or 'table' in output_type or 'file' in output_type
+
+def is_streaming_task(stage, task):
+    if stage == "staging":
+        return streaming.is_streaming_source(task)
+    return task.get("type") == "streaming"
+
+def get_deployed_dependencies(graph, deployed, key):
+    """Returns the deployed batch tasks a task waits for, looking through the view-only tasks"""
+    dependencies = set()
+    visited = set()
+    pending = list(graph[key]["depends_on"])
+    while pending:
+        dep = pending.pop()
+        if dep in visited:
+            continue
+        visited.add(dep)
+        if dep in deployed:
+            if not is_streaming_task(dep[0], graph[dep]["task"]):
+                dependencies.add(dep)
+        else:
+            pending += list(graph[dep]["depends_on"])
+    return dependencies
+
 def create_task(stage, name, working_dir, config_path, dbx_cluster):
     return {
         "task_key": name,
@@ -154,26 +150,3 @@ def create_task(stage, name, working_dir, config_path, dbx_cluster):
             }
         ],
     }
-
-def create_stage_gate_task(stage, dbx_cluster):
-    return {
-        "task_key": f"{stage}_gate",
-        "depends_on": [],
-        "python_wheel_task": {
-        "package_name": "cddp",
-        "entry_point": "wait_for_next_stage",
-        "named_parameters": {
-                "duration": "5"
-            }
-        },
-        "existing_cluster_id": dbx_cluster,
-        "libraries": [
-            {
-                "pypi": {
-                    "package": "cddp"
-                }
-            }
-        ],
-        "timeout_seconds": 0,
-        "email_notifications": {}
-    }
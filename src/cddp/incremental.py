@@ -0,0 +1,109 @@
+from pyspark import StorageLevel
+from pyspark.sql.functions import col, lit, max as max_
+import cddp.ingestion as cddp_ingestion
+import cddp.ingestion.filestore as filestore
+import cddp.ingestion.jdbc as jdbc
+import cddp.state as state_store
+import cddp.utils as utils
+import cddp.view_cache as view_cache
+
+
+def is_incremental(task):
+    """Checks if a staging task reads its input incrementally"""
+    return "input" in task and "incremental" in task["input"] \
+        and task["input"].get("read-type", "batch") == "batch"
+
+
+def get_incremental_conf(task):
+    conf = task["input"]["incremental"]
+    mode = conf.get("mode", "files")
+    if mode == "files" and task["input"]["type"] != "filestore":
+        raise Exception("Incremental mode 'files' only supports filestore input, use 'watermark' instead")
+    if mode == "files" and task["input"].get("compact"):
+        # the files mode reads the landed files, not their compact copy
+        raise Exception("Incremental mode 'files' doesn't read the compact landing copy, use 'watermark' instead")
+    if mode == "watermark" and "column" not in conf:
+        raise Exception("Incremental mode 'watermark' requires a 'column'")
+    if mode not in ["files", "watermark"]:
+        raise Exception("Unknown incremental mode: " + mode)
+    return mode, conf
+
+
+def reads_new_files(task):
+    """Checks if the task reads its new landed files only, in files mode or in watermark mode on files"""
+    return task["input"]["type"] == "filestore" and not task["input"].get("compact")
+
+
+def start_ingestion_task(spark, config, task):
+    """Reads the data not processed by the previous runs of the task
+
+    Returns the dataframe, the streaming flag and the pending state, which
+    must be saved with commit_increment once the output is written. A
+    filestore input only reads its new files in both modes, the watermark
+    then filters their rows. In watermark mode, the increment is persisted
+    for the run, so the max of the column is computed from the rows written.
+    """
+    mode, conf = get_incremental_conf(task)
+    task_state = state_store.load_task_state(config, task)
+    pending_state = {"mode": mode}
+    if reads_new_files(task):
+        path = utils.get_path_for_current_env("filestore", task["input"]["path"])
+        processed = task_state.get("files", {})
+        new_files = [f for f in filestore.list_landing_files(spark, task, config) if f["path"] not in processed]
+        print(f"[incremental] {task['name']}: {len(new_files)} new files, {len(processed)} already processed")
+        df, is_streaming = filestore.read_files(task, spark, [f["path"] for f in new_files], filestore.get_base_path(path))
+        df = filestore.apply_partition_filter(df, task["input"].get("partition_filter"))
+        files = dict(processed)
+        for f in new_files:
+            files[f["path"]] = {"size": f["size"], "mtime": f["mtime"]}
+        pending_state["files"] = files
+        pending_state["last_batch"] = [f["path"] for f in new_files]
+    if mode == "watermark":
+        column = conf["column"]
+        watermark = task_state.get("watermark")
+        if task["input"]["type"] == "jdbc":
+            # the database only returns the rows after the watermark
+            df, is_streaming = jdbc.start_ingestion_task(task, spark, watermark=(column, watermark, None))
+        elif not reads_new_files(task):
+            df, is_streaming = cddp_ingestion.start_ingestion_task(task, spark, config=config)
+        new_watermark = None
+        # without new files nor a schema, the increment has no columns
+        if len(df.columns) > 0:
+            if watermark is not None:
+                df = df.filter(col(column) > lit(watermark))
+            df = df.persist(StorageLevel.MEMORY_AND_DISK)
+            view_cache.track_persisted(spark, df)
+            new_watermark = df.agg(max_(col(column))).collect()[0][0]
+        print(f"[incremental] {task['name']}: watermark of {column} moves from {watermark} to {new_watermark}")
+        pending_state["column"] = column
+        pending_state["previous_watermark"] = watermark
+        pending_state["watermark"] = watermark if new_watermark is None else new_watermark
+    return df, is_streaming, pending_state
+
+
+def commit_increment(config, task, pending_state):
+    """Saves the state of the task after its increment is written"""
+    state_store.save_task_state(config, task, pending_state)
+
+
+def load_last_increment(spark, config, task):
+    """Reads the increment processed by the last run of the task"""
+    mode, conf = get_incremental_conf(task)
+    task_state = state_store.load_task_state(config, task)
+    if reads_new_files(task):
+        path = utils.get_path_for_current_env("filestore", task["input"]["path"])
+        df, _ = filestore.read_files(task, spark, task_state.get("last_batch", []), filestore.get_base_path(path))
+        df = filestore.apply_partition_filter(df, task["input"].get("partition_filter"))
+        if mode == "files" or len(df.columns) == 0:
+            return df
+    column = conf["column"]
+    if task["input"]["type"] == "jdbc":
+        df, _ = jdbc.start_ingestion_task(task, spark, watermark=(
+            column, task_state.get("previous_watermark"), task_state.get("watermark")))
+    elif not reads_new_files(task):
+        df, _ = cddp_ingestion.start_ingestion_task(task, spark, config=config)
+    if task_state.get("previous_watermark") is not None:
+        df = df.filter(col(column) > lit(task_state["previous_watermark"]))
+    if task_state.get("watermark") is not None:
+        df = df.filter(col(column) <= lit(task_state["watermark"]))
+    return df
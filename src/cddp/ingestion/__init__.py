@@ -4,11 +4,13 @@ import cddp.ingestion.azure_adls_gen1
 import cddp.ingestion.azure_adls_gen2
 import cddp.ingestion.azure_adls_gen2_syn
 import cddp.ingestion.filestore
+import cddp.ingestion.jdbc
 import cddp.ingestion.deltalake
 
+import cddp.landing as landing
 import cddp.utils as utils
 
-def start_ingestion_task(task, spark):
+def start_ingestion_task(task, spark, config=None):
     type = task['input']['type']
     if type == 'autoloader':
         return autoloader.start_ingestion_task(task, spark)
@@ -19,7 +21,11 @@ def start_ingestion_task(task, spark):
     elif type == 'deltalake':
         return deltalake.start_ingestion_task(task, spark)
     elif type == 'filestore':
-        return filestore.start_ingestion_task(task, spark)
+        if landing.is_compacted(task):
+            if config is None:
+                raise Exception(f"Compact landing of {task['name']} needs the pipeline config of its copy and state")
+            return landing.start_ingestion_task(task, spark, config)
+        return filestore.start_ingestion_task(task, spark, config)
     elif type == 'azure_adls_gen2':
         if utils.is_running_on_synapse(spark):
             return azure_adls_gen2_syn.start_ingestion_task(task, spark)
@@ -1,5 +1,6 @@
 
 from pyspark.sql.types import *
+import cddp.streaming as streaming
 
 def start_ingestion_task(task, spark):
     import dbutils
@@ -17,6 +18,7 @@ def start_ingestion_task(task, spark):
         autoLoaderConf["cloudFiles.connectionString"] = dbutils.secrets.get(scope = task["secret_scope"], key = task["connectionString"])
 
     autoLoaderConf["cloudFiles.format"] = task["format"]
+    autoLoaderConf.update(streaming.get_source_options(task))
 
     #add options from task options
     for key, value in task["options"].items():
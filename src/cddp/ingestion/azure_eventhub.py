@@ -1,5 +1,6 @@
 
 from pyspark.sql.types import *
+import cddp.streaming as streaming
 
 def start_ingestion_task(task, spark):
     import dbutils
@@ -8,6 +9,7 @@ def start_ingestion_task(task, spark):
     ehConf = {
         'eventhubs.connectionString' : conn_str
     }
+    ehConf.update(streaming.get_source_options(task))
 
     #add options from task options
     for key, value in task["options"].items():
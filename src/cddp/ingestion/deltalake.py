@@ -1,5 +1,6 @@
 
 from pyspark.sql.types import *
+import cddp.streaming as streaming
 
 def start_ingestion_task(task, spark):
     schema = StructType.fromJson(task["schema"])
@@ -16,6 +17,7 @@ def start_ingestion_task(task, spark):
         return df, False
     else:
         df = spark.readStream.format("delta") \
+            .options(**streaming.get_source_options(task)) \
             .options(**fileConf) \
             .schema(schema) \
             .load(task["path"])
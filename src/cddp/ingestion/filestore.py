@@ -1,34 +1,220 @@
-
+from functools import reduce
+import urllib.parse
+from pyspark.sql.functions import col, expr
 from pyspark.sql.types import *
+import cddp.schema_resolver as schema_resolver
+import cddp.state as state_store
+import cddp.streaming as streaming
 import cddp.utils as utils
 
-def start_ingestion_task(task, spark):
-    schema = StructType.fromJson(task["schema"])
+glob_chars = "*?[{"
+
+def start_ingestion_task(task, spark, config=None):
+    #remove '/' in path if running in non-databricks environment
+    path = utils.get_path_for_current_env("filestore",task["input"]["path"])
+    partition_filter = task["input"].get("partition_filter")
+    if task["input"]["read-type"] == "batch" and \
+            (isinstance(partition_filter, dict) or is_glob(path) or task["input"].get("listing_cache", False)):
+        # the folders are listed by cddp, pruning the partition folders, and
+        # spark lists the files of the data folders
+        paths = list_landing_folders(spark, task, config)
+        df, is_streaming = read_files(task, spark, paths, get_base_path(path))
+    else:
+        df, is_streaming = read_files(task, spark, path)
+    return apply_partition_filter(df, partition_filter), is_streaming
+
+
+def is_glob(path):
+    return any(c in path for c in glob_chars)
+
+
+def get_base_path(path):
+    """Returns the folder of a path before its first glob pattern, the root of the partition folders"""
+    if not is_glob(path):
+        return path
+    parts = path.split("/")
+    index = next(i for i, part in enumerate(parts) if is_glob(part))
+    return "/".join(parts[:index])
+
+
+def get_partition_values(partition_filter):
+    """Converts a dict partition filter, e.g. {"year": 2023, "month": [1, 2]}, to lists of values by key"""
+    values = {}
+    for key, value in partition_filter.items():
+        values[key.lower()] = value if isinstance(value, list) else [value]
+    return values
+
+
+def is_partition_value(text, values):
+    """Checks if the value of a partition folder is one of the filter values
+
+    The folder value is compared as Spark infers it, so a number matches
+    the folder value with leading zeros, e.g. 1 matches month=01.
+    """
+    text = urllib.parse.unquote(text)
+    for value in values:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            try:
+                if (int(text) if isinstance(value, int) else float(text)) == value:
+                    return True
+            except ValueError:
+                continue
+        elif str(value) == text:
+            return True
+    return False
+
+
+def apply_partition_filter(df, partition_filter):
+    """Filters the dataframe by the partition filter, a dict of partition values or a SQL condition"""
+    if partition_filter is None:
+        return df
+    if isinstance(partition_filter, str):
+        return df.where(expr(partition_filter))
+    conditions = []
+    for key, value in partition_filter.items():
+        value = value if isinstance(value, list) else [value]
+        conditions.append(col(key).isin(value))
+    return df.where(reduce(lambda a, b: a & b, conditions)) if conditions else df
+
+
+def read_files(task, spark, paths, base_path=None):
+    """Reads the landed files of a task, paths is a folder or a list of files"""
     fileConf = {}
     #add options from task options
     if 'options' in task['input'] and task['input']['options'] is not None:
         for key, value in task["input"]["options"].items():
             fileConf[key] = value
-    #remove '/' in path if running in non-databricks environment 
-    path = utils.get_path_for_current_env("filestore",task["input"]["path"])
-    
+    if base_path is not None:
+        fileConf["basePath"] = base_path
+
     if task["input"]["read-type"] == "batch":
+        if isinstance(paths, list) and len(paths) == 0:
+            return spark.createDataFrame([], schema_resolver.resolve_schema(spark, task, paths)), False
         df = spark.read.format(task["input"]["format"]) \
             .option("header", "true") \
-            .option("inferSchema", "true") \
             .option("multiline", "true") \
             .options(**fileConf) \
-            .schema(schema) \
-            .load(path)
+            .schema(schema_resolver.resolve_schema(spark, task, paths)) \
+            .load(paths)
         return df, False
     elif task["input"]["read-type"] == "streaming":
         df = spark.readStream.format(task["input"]["format"]) \
             .option("header", "true") \
-            .option("inferSchema", "true") \
+            .options(**streaming.get_source_options(task)) \
             .options(**fileConf) \
-            .schema(schema) \
-            .load(path)
+            .schema(schema_resolver.resolve_schema(spark, task, paths)) \
+            .load(paths)
         return df, True
     else:
         raise Exception("Unknown read-type: " + task["input"]["read-type"])
-    
\ No newline at end of file
+
+
+def list_landing_files(spark, task, config=None):
+    """Lists the data files of the input path of a task
+
+    The path may have glob patterns. Partition folders (key=value) not
+    matching a dict `partition_filter` are skipped without being listed.
+    With `listing_cache`, the entries of each folder are kept in an index in
+    the working dir and only listed again when the folder modification time
+    changes. The status of every folder is still read, and new files are only
+    found on file systems updating the folder modification time, e.g. HDFS,
+    ADLS Gen2 or local disks.
+    """
+    return list_landing(spark, task, config, False)
+
+
+def list_landing_folders(spark, task, config=None):
+    """Lists the data folders of the input path of a task, pruned like list_landing_files
+
+    A folder holding only files is returned as a folder, for Spark to list
+    its files when reading it. With `listing_cache`, the status of a cached
+    data folder isn't read again, only the folders holding folders are
+    checked for new partitions. The files of a folder holding both files and
+    folders are returned one by one.
+    """
+    return [entry["path"] for entry in list_landing(spark, task, config, True)]
+
+
+def list_landing(spark, task, config, folders):
+    path = utils.get_path_for_current_env("filestore", task["input"]["path"])
+    partition_filter = task["input"].get("partition_filter")
+    partition_values = get_partition_values(partition_filter) if isinstance(partition_filter, dict) else {}
+    use_cache = task["input"].get("listing_cache", False) and config is not None
+    cache_path = state_store.get_listing_cache_path(config, path) if use_cache else None
+    cache = state_store.load_json(cache_path) if use_cache else None
+
+    make_path = spark._jvm.org.apache.hadoop.fs.Path
+    hadoop_path = make_path(path)
+    fs = hadoop_path.getFileSystem(spark._jsc.hadoopConfiguration())
+    statuses = fs.globStatus(hadoop_path) if is_glob(path) else \
+        ([fs.getFileStatus(hadoop_path)] if fs.exists(hadoop_path) else [])
+    entries = []
+    for status in statuses or []:
+        if status.isDirectory():
+            walk_folder(fs, make_path, get_file_entry(status), partition_values, cache, entries, folders)
+        else:
+            entries.append(get_file_entry(status))
+    if use_cache:
+        state_store.save_json(cache_path, cache)
+    entries.sort(key=lambda f: f["path"])
+    return entries
+
+
+def get_file_entry(status):
+    return {
+        "path": status.getPath().toString(),
+        "size": status.getLen(),
+        "mtime": status.getModificationTime()
+    }
+
+
+def is_hidden(name):
+    # skip hidden and metadata files the same way Spark does
+    return name.startswith("_") or name.startswith(".")
+
+
+def is_data_folder(cached):
+    """Checks if a cached folder holds files and no folders"""
+    listing = [entry for entry in cached["entries"] if not is_hidden(entry["name"])]
+    return len(listing) > 0 and not any(entry["is_dir"] for entry in listing)
+
+
+def walk_folder(fs, make_path, folder_entry, partition_values, cache, entries, folders=False):
+    """Adds the files under a folder to entries, or its data folders if folders is set"""
+    folder = folder_entry["path"]
+    mtime = folder_entry["mtime"]
+    cached = cache.get(folder) if cache is not None else None
+    from_cache = cached is not None and cached["mtime"] == mtime
+    if from_cache:
+        listing = cached["entries"]
+    else:
+        listing = []
+        for status in fs.listStatus(make_path(folder)):
+            entry = get_file_entry(status)
+            entry["name"] = status.getPath().getName()
+            entry["is_dir"] = status.isDirectory()
+            listing.append(entry)
+        if cache is not None:
+            cache[folder] = {"mtime": mtime, "entries": listing}
+    listing = [entry for entry in listing if not is_hidden(entry["name"])]
+    subfolders = [entry for entry in listing if entry["is_dir"]]
+    if folders and listing and not subfolders:
+        entries.append({"path": folder, "size": None, "mtime": mtime})
+        return
+    entries += [{"path": entry["path"], "size": entry["size"], "mtime": entry["mtime"]}
+                for entry in listing if not entry["is_dir"]]
+    for entry in subfolders:
+        if "=" in entry["name"]:
+            key, value = entry["name"].split("=", 1)
+            if key.lower() in partition_values and not is_partition_value(value, partition_values[key.lower()]):
+                continue
+        if from_cache:
+            subfolder_cache = cache.get(entry["path"])
+            if folders and subfolder_cache is not None and is_data_folder(subfolder_cache):
+                # spark lists the files of the data folder when reading it
+                entries.append({"path": entry["path"], "size": None, "mtime": subfolder_cache["mtime"]})
+                continue
+            # the cached mtime of a subfolder is as old as the listing of its
+            # parent, which doesn't change when files are added to the subfolder
+            entry = get_file_entry(fs.getFileStatus(make_path(entry["path"])))
+        walk_folder(fs, make_path, entry, partition_values, cache, entries, folders)
@@ -1,19 +1,119 @@
-
+import datetime
+import decimal
 from pyspark.sql.types import *
 
-def start_ingestion_task(task, spark):
-    import dbutils
+default_fetch_size = 10000
+
+
+def get_dbutils(spark):
+    from pyspark.dbutils import DBUtils
+    return DBUtils(spark)
+
+
+def get_credentials(spark, conf):
+    """Returns the user and password of the database, from the secret scope on Databricks"""
+    if "secret_scope" in conf:
+        dbutils = get_dbutils(spark)
+        username = dbutils.secrets.get(scope = conf["secret_scope"], key = conf["jdbc_username"])
+        password = dbutils.secrets.get(scope = conf["secret_scope"], key = conf["jdbc_password"])
+        return username, password
+    return conf.get("user"), conf.get("password")
+
+
+def to_sql_literal(value):
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, float, decimal.Decimal)):
+        return str(value)
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        value = value.isoformat(sep=" ") if isinstance(value, datetime.datetime) else value.isoformat()
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def get_watermark_condition(column, lower=None, upper=None):
+    """Returns the condition of the rows with lower < column <= upper"""
+    conditions = []
+    if lower is not None:
+        conditions.append(f"{column} > {to_sql_literal(lower)}")
+    if upper is not None:
+        conditions.append(f"{column} <= {to_sql_literal(upper)}")
+    return " AND ".join(conditions)
+
+
+def get_source_table(conf, condition=None):
+    """Returns the dbtable of a read, the table or the query of the task filtered by the condition"""
+    if "query" in conf:
+        source = f"({conf['query']}) cddp_query"
+    else:
+        source = conf["table_name"]
+    if not condition:
+        return source
+    return f"(SELECT * FROM {source} WHERE {condition}) cddp_source"
+
+
+def get_bounds(spark, url, source, column, properties):
+    """Queries the min and max of the partition column, computed by the database"""
+    bounds_query = f"(SELECT MIN({column}) AS lower_bound, MAX({column}) AS upper_bound FROM {source}) cddp_bounds"
+    properties = dict((key, value) for key, value in properties.items() if key != "customSchema")
+    row = spark.read.jdbc(url, bounds_query, properties=properties).collect()[0]
+    return row["lower_bound"], row["upper_bound"]
+
+
+def get_custom_schema(task):
+    """Converts the declared schema to the customSchema option, JDBC reads don't accept a schema"""
+    if not task.get("schema"):
+        return None
     schema = StructType.fromJson(task["schema"])
-    username = dbutils.secrets.get(scope = task["secret_scope"], key = task["jdbc_username"])
-    password = dbutils.secrets.get(scope = task["secret_scope"], key = task["jdbc_password"])
-
-    spark.read \
-        .format("jdbc") \
-        .option("url", task["jdbc_url"]) \
-        .option("dbtable", task["table_name"]) \
-        .option("user", username) \
-        .option("password", password) \
-        .schema(schema) \
-        .load()
-    
-    return df, False
\ No newline at end of file
+    return ", ".join(f"{field.name} {field.dataType.simpleString()}" for field in schema.fields)
+
+
+def start_ingestion_task(task, spark, watermark=None):
+    """Reads a table or query of a database, in parallel partitions if configured
+
+    With `predicates`, each where clause is read as a partition. With a
+    numeric, date or timestamp `partition_column`, the range between
+    `lower_bound` and `upper_bound`, queried from the database if not set,
+    is split in `num_partitions` partitions. watermark is a (column, lower,
+    upper) tuple, its condition is pushed into the source query so the
+    bounds and partitions only cover the new rows.
+    """
+    conf = task["input"]
+    username, password = get_credentials(spark, conf)
+    url = conf["jdbc_url"]
+    properties = {"fetchsize": str(conf.get("fetchsize", default_fetch_size))}
+    if username is not None:
+        properties["user"] = username
+    if password is not None:
+        properties["password"] = password
+    if "driver" in conf:
+        properties["driver"] = conf["driver"]
+    custom_schema = get_custom_schema(task)
+    if custom_schema is not None:
+        properties["customSchema"] = custom_schema
+    for key, value in (conf.get("options") or {}).items():
+        properties[key] = str(value)
+    source = get_source_table(conf, get_watermark_condition(*watermark) if watermark else None)
+
+    if conf.get("predicates"):
+        df = spark.read.jdbc(url, source, predicates=conf["predicates"], properties=properties)
+        return df, False
+
+    reader = spark.read.format("jdbc") \
+        .option("url", url) \
+        .option("dbtable", source) \
+        .options(**properties)
+    partition_column = conf.get("partition_column")
+    if partition_column:
+        lower_bound, upper_bound = conf.get("lower_bound"), conf.get("upper_bound")
+        if lower_bound is None or upper_bound is None:
+            bounds = get_bounds(spark, url, source, partition_column, properties)
+            lower_bound = bounds[0] if lower_bound is None else lower_bound
+            upper_bound = bounds[1] if upper_bound is None else upper_bound
+        # without bounds the source is empty, and is read in one partition
+        if lower_bound is not None and upper_bound is not None:
+            reader = reader \
+                .option("partitionColumn", partition_column) \
+                .option("lowerBound", str(lower_bound)) \
+                .option("upperBound", str(upper_bound)) \
+                .option("numPartitions", str(conf.get("num_partitions", spark.sparkContext.defaultParallelism)))
+    return reader.load(), False
@@ -0,0 +1,137 @@
+"""Compact landing: converts the landed CSV and JSON files of a filestore task to a columnar copy
+
+A filestore staging task sets `compact` in its input, e.g.
+`"compact": {"format": "parquet", "partition_by": ["year"]}`. Each run first
+converts the landed files which aren't converted yet, then reads the copy,
+so the text of a file is only parsed once. The converted files are tracked
+in the state store of the working dir.
+"""
+from pyspark.sql.functions import lit
+import cddp.ingestion.filestore as filestore
+import cddp.state as state_store
+import cddp.streaming as streaming
+import cddp.utils as utils
+
+
+text_formats = ["csv", "json"]
+compact_formats = ["parquet", "delta"]
+# the parquet copy is partitioned by batch, so a retried batch replaces its own files
+batch_column = "cddp_landing_batch"
+
+
+def is_compacted(task):
+    return bool(task["input"].get("compact"))
+
+
+def get_compact_conf(task):
+    conf = task["input"].get("compact")
+    conf = {} if conf is True else dict(conf)
+    if task["input"]["type"] != "filestore":
+        raise Exception("Compact landing only supports filestore input")
+    if task["input"]["format"] not in text_formats:
+        raise Exception(f"Compact landing only converts {text_formats} files, not {task['input']['format']}")
+    conf["format"] = conf.get("format", "parquet")
+    if conf["format"] not in compact_formats:
+        raise Exception(f"Unknown compact landing format {conf['format']}, expecting one of {compact_formats}")
+    return conf
+
+
+def get_compact_path(config, task):
+    return get_compact_conf(task).get("path") or f"{config['app_data_path']}landing/{task['output']['target']}"
+
+
+def path_exists(spark, path):
+    hadoop_path = spark._jvm.org.apache.hadoop.fs.Path(path)
+    return hadoop_path.getFileSystem(spark._jsc.hadoopConfiguration()).exists(hadoop_path)
+
+
+def delete_path(spark, path):
+    hadoop_path = spark._jvm.org.apache.hadoop.fs.Path(path)
+    hadoop_path.getFileSystem(spark._jsc.hadoopConfiguration()).delete(hadoop_path, True)
+
+
+def write_batch(spark, config, task, batch):
+    """Appends the landed files of a batch to the compact copy"""
+    conf = get_compact_conf(task)
+    path = utils.get_path_for_current_env("filestore", task["input"]["path"])
+    landing_task = dict(task, input=dict(task["input"], **{"read-type": "batch"}))
+    df, _ = filestore.read_files(landing_task, spark, batch["files"], filestore.get_base_path(path))
+    partition_by = conf.get("partition_by") or []
+    # a batch is retried when the run failed before saving the state
+    if conf["format"] == "delta":
+        # delta skips a batch it already committed
+        writer = df.write.format("delta").mode("append") \
+            .option("txnAppId", f"cddp_landing_{task['name']}").option("txnVersion", batch["batch_id"])
+    else:
+        # only the partition of the batch is overwritten, which drops the files of a failed attempt
+        df = df.withColumn(batch_column, lit(batch["batch_id"]))
+        partition_by = [batch_column] + partition_by
+        writer = df.write.format(conf["format"]).mode("overwrite").option("partitionOverwriteMode", "dynamic")
+    if partition_by:
+        writer = writer.partitionBy(*partition_by)
+    writer.save(get_compact_path(config, task))
+
+
+def compact_landing(spark, config, task):
+    """Converts the landed files not converted yet, returns the number of converted files"""
+    state_path = state_store.get_landing_state_path(config, task)
+    state = state_store.load_json(state_path)
+    converted = state.get("files", {})
+    compact_path = get_compact_path(config, task)
+    if not state and path_exists(spark, compact_path):
+        # the state was reset, e.g. by a cleanup, while a custom path kept the
+        # copy: its delta transactions would skip the new batches, and its
+        # parquet batches would be read again, so it is converted again
+        print(f"[landing] {task['name']}: no converted files are tracked, deleting the compact copy {compact_path}")
+        delete_path(spark, compact_path)
+    if state.get("pending") is not None:
+        # the last run failed while converting this batch
+        write_batch(spark, config, task, state["pending"])
+        for f in state["pending"]["files_info"]:
+            converted[f["path"]] = {"size": f["size"], "mtime": f["mtime"]}
+        state = {"batch_id": state["pending"]["batch_id"], "files": converted}
+        state_store.save_json(state_path, state)
+
+    # all the partitions are converted, the partition filter applies to the reads of the copy
+    landing_task = dict(task, input=dict(task["input"], partition_filter=None))
+    files = filestore.list_landing_files(spark, landing_task, config)
+    changed = [f["path"] for f in files if f["path"] in converted
+               and (converted[f["path"]]["size"], converted[f["path"]]["mtime"]) != (f["size"], f["mtime"])]
+    if changed:
+        print(f"[landing] {task['name']}: {len(changed)} landed files changed after their conversion and aren't converted again: {changed[:5]}")
+    new_files = [f for f in files if f["path"] not in converted]
+    print(f"[landing] {task['name']}: {len(new_files)} new files, {len(converted)} already converted")
+    if not new_files:
+        return 0
+    batch = {"batch_id": state.get("batch_id", -1) + 1, "files": [f["path"] for f in new_files], "files_info": new_files}
+    state_store.save_json(state_path, dict(state, pending=batch))
+    write_batch(spark, config, task, batch)
+    for f in new_files:
+        converted[f["path"]] = {"size": f["size"], "mtime": f["mtime"]}
+    state_store.save_json(state_path, {"batch_id": batch["batch_id"], "files": converted})
+    return len(new_files)
+
+
+def start_ingestion_task(task, spark, config):
+    """Converts the new landed files of a task, then reads its compact copy"""
+    compact_landing(spark, config, task)
+    conf = get_compact_conf(task)
+    path = get_compact_path(config, task)
+    if task["input"]["read-type"] == "batch":
+        if not path_exists(spark, path):
+            df, is_streaming = filestore.read_files(task, spark, [])
+        else:
+            df, is_streaming = spark.read.format(conf["format"]).load(path), False
+    elif task["input"]["read-type"] == "streaming":
+        if not path_exists(spark, path):
+            raise Exception(f"No landed files of {task['name']} are converted yet, the compact landing stream can't start")
+        reader = spark.readStream.format(conf["format"]).options(**streaming.get_source_options(task))
+        if conf["format"] == "parquet":
+            # file streams need a schema, the one of the parquet footers
+            reader = reader.schema(spark.read.format("parquet").load(path).schema)
+        df, is_streaming = reader.load(path), True
+    else:
+        raise Exception("Unknown read-type: " + task["input"]["read-type"])
+    if batch_column in df.columns:
+        df = df.drop(batch_column)
+    return filestore.apply_partition_filter(df, task["input"].get("partition_filter")), is_streaming
@@ -0,0 +1,277 @@
+import functools
+import json
+import os
+import threading
+import time
+import urllib.request
+import uuid
+
+
+lock = threading.Lock()
+run_state = {"sink": None, "run_id": None}
+
+
+class MemorySink:
+    """Keeps the task metrics in a list"""
+
+    def __init__(self):
+        self.records = []
+
+    def write(self, record):
+        with lock:
+            self.records.append(record)
+
+
+class JsonLinesSink:
+    """Appends the task metrics to a JSON lines file"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def write(self, record):
+        with lock:
+            folder = os.path.dirname(self.path)
+            if folder and not os.path.exists(folder):
+                os.makedirs(folder, exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps(record, default=str) + "\n")
+
+
+class PrometheusTextfileSink:
+    """Writes the last metrics of each task to a file for the Prometheus node exporter textfile collector"""
+
+    gauges = {
+        "wall_time": "cddp_task_wall_time_seconds",
+        "input_rows": "cddp_task_input_rows",
+        "output_rows": "cddp_task_output_rows",
+        "bytes_written": "cddp_task_bytes_written",
+        "shuffle_bytes": "cddp_task_shuffle_write_bytes"
+    }
+
+    def __init__(self, path):
+        self.path = path
+        self.records = {}
+
+    def write(self, record):
+        with lock:
+            self.records[(record["pipeline"], record["stage"], record["task"])] = record
+            lines = []
+            for key, name in self.gauges.items():
+                lines.append(f"# TYPE {name} gauge")
+                for r in self.records.values():
+                    if r.get(key) is not None:
+                        labels = f'pipeline="{r["pipeline"]}",stage="{r["stage"]}",task="{r["task"]}"'
+                        lines.append(f"{name}{{{labels}}} {r[key]}")
+            # the collector may read the file at any time, so it is replaced atomically
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                f.write("\n".join(lines) + "\n")
+            os.replace(tmp_path, self.path)
+
+
+class DeltaTableSink:
+    """Appends the task metrics to a delta table"""
+
+    def __init__(self, spark, table_name):
+        self.spark = spark
+        self.table_name = table_name
+
+    def write(self, record):
+        row = dict((key, json.dumps(value) if isinstance(value, (list, dict)) else value) for key, value in record.items())
+        with lock:
+            self.spark.createDataFrame([row], schema=get_delta_sink_schema()) \
+                .write.format("delta").mode("append").option("mergeSchema", "true").saveAsTable(self.table_name)
+
+
+def get_delta_sink_schema():
+    from pyspark.sql.types import StructType, StructField, StringType, DoubleType, LongType
+    return StructType([
+        StructField("run_id", StringType()),
+        StructField("pipeline", StringType()),
+        StructField("stage", StringType()),
+        StructField("task", StringType()),
+        StructField("status", StringType()),
+        StructField("error", StringType()),
+        StructField("start_time", DoubleType()),
+        StructField("wall_time", DoubleType()),
+        StructField("job_ids", StringType()),
+        StructField("stage_ids", StringType()),
+        StructField("input_rows", LongType()),
+        StructField("output_rows", LongType()),
+        StructField("bytes_written", LongType()),
+        StructField("shuffle_bytes", LongType()),
+        StructField("streaming", StringType())
+    ])
+
+
+def create_sink(spark, metrics_config):
+    """Creates the sink of a pipeline `metrics` config, e.g. {"sink": "jsonl", "path": "./tmp/metrics.jsonl"}"""
+    sink_type = metrics_config.get("sink", "jsonl")
+    if sink_type == "jsonl":
+        return JsonLinesSink(metrics_config["path"])
+    elif sink_type == "prometheus":
+        return PrometheusTextfileSink(metrics_config["path"])
+    elif sink_type == "delta":
+        return DeltaTableSink(spark, metrics_config["table"])
+    else:
+        raise Exception("Unknown metrics sink: " + sink_type)
+
+
+def begin_run(sink):
+    """Sends the task metrics of the run to the sink, None to only print them"""
+    run_state["sink"] = sink
+    run_state["run_id"] = str(uuid.uuid4())
+
+
+def end_run():
+    run_state["sink"] = None
+    run_state["run_id"] = None
+
+
+def emit(record):
+    print(f"[metrics] {record['stage']}.{record['task']}: {record['status']} in {record['wall_time']:.2f}s, "
+          f"output rows: {record.get('output_rows')}")
+    sink = run_state["sink"]
+    if sink is not None:
+        sink.write(record)
+
+
+def instrument(stage):
+    """Records the metrics of a start_*_job function, called as func(spark, config, task, ...)"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(spark, config, task, *args, **kwargs):
+            sc = spark.sparkContext
+            previous_group = sc.getLocalProperty("spark.jobGroup.id")
+            previous_description = sc.getLocalProperty("spark.job.description")
+            job_group = f"cddp_{stage}_{task['name']}_{uuid.uuid4().hex[:8]}"
+            sc.setJobGroup(job_group, f"cddp {stage}.{task['name']}")
+            record = {
+                "run_id": run_state["run_id"],
+                "pipeline": config.get("name"),
+                "stage": stage,
+                "task": task["name"],
+                "status": "succeeded",
+                "error": None,
+                "start_time": time.time()
+            }
+            try:
+                return func(spark, config, task, *args, **kwargs)
+            except Exception as e:
+                record["status"] = "failed"
+                record["error"] = str(e)
+                raise
+            finally:
+                record["wall_time"] = time.time() - record["start_time"]
+                sc.setLocalProperty("spark.jobGroup.id", previous_group)
+                sc.setLocalProperty("spark.job.description", previous_description)
+                if run_state["sink"] is not None:
+                    collect_task_metrics(spark, config, stage, task, job_group, record)
+                emit(record)
+        return wrapper
+    return decorator
+
+
+def collect_task_metrics(spark, config, stage, task, job_group, record):
+    """Adds the Spark job/stage ids, row counts and bytes of a finished task to its record"""
+    try:
+        tracker = spark.sparkContext.statusTracker()
+        job_ids = sorted(tracker.getJobIdsForGroup(job_group))
+        stage_ids = set()
+        for job_id in job_ids:
+            job = tracker.getJobInfo(job_id)
+            if job is not None:
+                stage_ids.update(job.stageIds)
+        record["job_ids"] = job_ids
+        record["stage_ids"] = sorted(stage_ids)
+        stages = get_spark_rest(spark, "stages")
+        if stages is not None:
+            stages = [s for s in stages if s["stageId"] in stage_ids]
+            record["input_rows"] = sum(s.get("inputRecords", 0) for s in stages)
+            record["output_rows"] = sum(s.get("outputRecords", 0) for s in stages)
+            record["bytes_written"] = sum(s.get("outputBytes", 0) for s in stages)
+            record["shuffle_bytes"] = sum(s.get("shuffleWriteBytes", 0) for s in stages)
+        record.update(get_delta_write_metrics(spark, config, stage, task))
+    except Exception as e:
+        print(f"[metrics] cannot collect the metrics of {task['name']}: {e}")
+
+
+def get_delta_write_metrics(spark, config, stage, task):
+    """Reads the rows and bytes written by the last delta commit of the task output"""
+    from delta.tables import DeltaTable
+    import cddp.writer as writer
+    output_type = task["output"]["type"]
+    target = task["output"]["target"]
+    if writer.get_storage_format(task) != "delta" or task.get("type") == "streaming":
+        return {}
+    if "table" in output_type:
+        delta_table = DeltaTable.forName(spark, target)
+    elif "file" in output_type:
+        stage_path = config[{"staging": "staging_path", "standard": "standard_path", "serving": "serving_path"}[stage]]
+        delta_table = DeltaTable.forPath(spark, stage_path+"/data/"+target)
+    else:
+        return {}
+    history = delta_table.history(1).select("operationMetrics").collect()
+    if not history or history[0]["operationMetrics"] is None:
+        return {}
+    operation_metrics = history[0]["operationMetrics"]
+    metrics = {}
+    if "numOutputRows" in operation_metrics:
+        metrics["output_rows"] = int(operation_metrics["numOutputRows"])
+    if "numOutputBytes" in operation_metrics:
+        metrics["bytes_written"] = int(operation_metrics["numOutputBytes"])
+    if "numSourceRows" in operation_metrics:
+        metrics["input_rows"] = int(operation_metrics["numSourceRows"])
+    return metrics
+
+
+def record_streaming_queries(config, items):
+    """Emits the last progress of the streaming queries of a run, the items of the streaming registry"""
+    for item in items:
+        try:
+            record_streaming_query(config, item)
+        except Exception as e:
+            print(f"[metrics] cannot record the streaming query of {item['task']['name']}: {e}")
+
+
+def record_streaming_query(config, item):
+    query = item["query"]
+    progress = query.lastProgress
+    task = item["task"]
+    error = query.exception()
+    record = {
+        "run_id": run_state["run_id"],
+        "pipeline": config.get("name"),
+        "stage": "streaming",
+        "task": task["name"],
+        "status": "failed" if error is not None else "succeeded",
+        "error": str(error) if error is not None else None,
+        "start_time": item["started"],
+        "wall_time": time.time() - item["started"],
+        "streaming": None
+    }
+    if progress is not None:
+        record["input_rows"] = progress.get("numInputRows")
+        record["streaming"] = {
+            "id": progress.get("id"),
+            "batch_id": progress.get("batchId"),
+            "num_input_rows": progress.get("numInputRows"),
+            "input_rows_per_second": progress.get("inputRowsPerSecond"),
+            "processed_rows_per_second": progress.get("processedRowsPerSecond"),
+            "duration_ms": progress.get("durationMs")
+        }
+    emit(record)
+
+
+def get_spark_rest(spark, api_path):
+    """Calls the monitoring REST API of the Spark UI, None if the UI is disabled"""
+    ui_url = spark.sparkContext.uiWebUrl
+    if ui_url is None:
+        return None
+    app_id = spark.sparkContext.applicationId
+    try:
+        with urllib.request.urlopen(f"{ui_url}/api/v1/applications/{app_id}/{api_path}", timeout=10) as response:
+            return json.loads(response.read())
+    except Exception as e:
+        print(f"[metrics] cannot read {api_path} from the Spark UI: {e}")
+        return None
@@ -0,0 +1,159 @@
+import threading
+from pyspark.sql.types import StructType
+import cddp.scheduler as scheduler
+import cddp.utils as utils
+
+
+# output schemas of the analyzed tasks, keyed by the config hash of the task and of its input schemas
+schema_cache = {}
+lock = threading.Lock()
+
+
+def create_stub_session(spark):
+    """Returns a session sharing the catalog of spark, with its own temp views"""
+    session = spark.newSession()
+    session.catalog.setCurrentDatabase(spark.catalog.currentDatabase())
+    return session
+
+
+def register_stub_view(session, name, schema):
+    df = session.createDataFrame([], schema)
+    df.createOrReplaceTempView(name)
+    return df
+
+
+def get_plan(df):
+    """Returns the formatted physical plan of a dataframe, as printed by df.explain("formatted")"""
+    return df._sc._jvm.PythonSQLUtils.explainString(df._jdf.queryExecution(), "formatted")
+
+
+def is_analyzable(task):
+    """Checks if the code of a task can be analyzed without running it, only SQL can"""
+    return task["code"]["lang"] == "sql"
+
+
+def analyze_task(session, task):
+    """Analyzes the SQL code of a standard or serving task against the views of the session
+
+    spark.sql resolves the tables and columns of the query when it is called,
+    without running it.
+    """
+    return session.sql(scheduler.get_task_code(task))
+
+
+def get_needed_tasks(graph, stage_arg=None, task_arg=None):
+    """Returns the selected tasks and the tasks they depend on"""
+    needed = set()
+    pending = [key for key, node in graph.items()
+               if (stage_arg is None or node["stage"] == stage_arg)
+               and (task_arg is None or key[1] == task_arg)]
+    while pending:
+        key = pending.pop()
+        if key not in needed:
+            needed.add(key)
+            pending += list(graph[key]["depends_on"])
+    return needed
+
+
+def analyze_pipeline(spark, config, stage_arg=None, task_arg=None, with_plans=False):
+    """Resolves the output schema of the tasks without reading any data
+
+    Staging targets are stubbed with empty views of their declared schema,
+    then the standard and serving SQL code is analyzed in dependency order,
+    each output being stubbed in turn. Python tasks aren't run, their output
+    is stubbed with the `schema` declared in their output, if any. Returns
+    the results keyed by (stage, task name), each a dict with the `schema` or
+    the `error` of the task, and the `plan` of the task when with_plans is
+    set. The schema is None, with the `reason`, when it can't be known
+    before reading the data.
+    """
+    graph = scheduler.build_task_graph(config)
+    needed = get_needed_tasks(graph, stage_arg, task_arg)
+    session = create_stub_session(spark)
+    schemas = {}
+    results = {}
+    for key in scheduler.get_task_order(graph):
+        if key not in needed:
+            continue
+        stage, name = key
+        task = graph[key]["task"]
+        target = task["output"]["target"]
+        plan = None
+        if stage == "staging":
+            if not task.get("schema"):
+                results[key] = {"schema": None, "reason": "no declared schema, it is inferred from the input"}
+                continue
+            schema = StructType.fromJson(task["schema"])
+        elif any("error" in results[dep] for dep in graph[key]["depends_on"]):
+            results[key] = {"error": "skipped, an upstream task failed", "skipped": True}
+            continue
+        elif any(results[dep]["schema"] is None for dep in graph[key]["depends_on"]):
+            results[key] = {"schema": None, "reason": "the schema of an upstream task is unknown"}
+            continue
+        elif not is_analyzable(task):
+            # python code could have any side effect, so it is never run before the pipeline
+            if not task["output"].get("schema"):
+                results[key] = {"schema": None, "reason": "python code isn't analyzed, declare its output schema"}
+                continue
+            schema = StructType.fromJson(task["output"]["schema"])
+        else:
+            referenced = scheduler.get_referenced_names(task)
+            inputs = dict((ref, schemas[ref].json()) for ref in sorted(referenced) if ref in schemas)
+            cache_key = utils.get_config_hash({"task": task, "inputs": inputs})
+            with lock:
+                schema = None if with_plans else schema_cache.get(cache_key)
+            if schema is None:
+                try:
+                    df = analyze_task(session, task)
+                    schema = df.schema
+                    if with_plans:
+                        plan = get_plan(df)
+                except Exception as e:
+                    results[key] = {"error": str(e).strip().split("\n")[0]}
+                    continue
+                with lock:
+                    schema_cache[cache_key] = schema
+        stub_df = register_stub_view(session, target, schema)
+        schemas[target.lower()] = schema
+        results[key] = {"schema": schema}
+        if with_plans:
+            results[key]["plan"] = plan if plan is not None else get_plan(stub_df)
+    return results
+
+
+def run_preflight(spark, config, stage_arg=None, task_arg=None, with_plans=False):
+    """Analyzes the tasks of the pipeline, raises with all the errors found"""
+    results = analyze_pipeline(spark, config, stage_arg, task_arg, with_plans)
+    check_results(results)
+    return results
+
+
+def check_results(results):
+    errors = [f"{stage}.{name}: {result['error']}" for (stage, name), result in results.items()
+              if "error" in result and not result.get("skipped", False)]
+    if errors:
+        raise Exception("Pre-flight analysis failed:\n" + "\n".join(errors))
+
+
+def get_task_schema(spark, config, stage, task_name):
+    """Returns the output schema of a task, raises if its code can't be analyzed"""
+    result = analyze_pipeline(spark, config, stage, task_name)[(stage, task_name)]
+    if "error" in result:
+        raise Exception(f"{stage}.{task_name}: {result['error']}")
+    if result["schema"] is None:
+        raise Exception(f"{stage}.{task_name}: unknown schema, {result['reason']}")
+    return result["schema"]
+
+
+def print_results(results):
+    for (stage, name), result in results.items():
+        print(f"==== {stage}.{name} ====")
+        if "error" in result:
+            print(f"error: {result['error']}")
+            continue
+        if result["schema"] is None:
+            print(f"unknown schema: {result['reason']}")
+            continue
+        print(result["schema"].simpleString())
+        if "plan" in result:
+            print(result["plan"])
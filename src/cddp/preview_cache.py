@@ -0,0 +1,116 @@
+import builtins
+import keyword
+import re
+import threading
+from collections import OrderedDict
+from delta.tables import DeltaTable
+import cddp.dataset as dataset
+import cddp.preflight as preflight
+import cddp.sandbox as sandbox
+import cddp.scheduler as scheduler
+import cddp.utils as utils
+
+
+# pandas results of the task previews, keyed by the hash of the task, its
+# upstream configs and the versions of its input tables
+results = OrderedDict()
+# budget of the pandas memory of the cached results
+max_cache_bytes = 256 * 1024 * 1024
+cache_state = {"bytes": 0}
+lock = threading.Lock()
+relation_pattern = re.compile(r"UnresolvedRelation \[([^\]]*)\]")
+python_names = set(name.lower() for name in keyword.kwlist + dir(builtins))
+
+
+def get_table_names(spark, task):
+    """Returns the lower case names of the tables a task may read
+
+    The tables of SQL code are the relations of its parsed plan, including
+    subqueries. Python code can't be parsed, so its identifiers, except the
+    python keywords and builtins, are candidates.
+    """
+    code = task.get("code", {})
+    if code.get("lang", "sql") == "sql":
+        try:
+            plan = spark._jsparkSession.sessionState().sqlParser().parsePlan(scheduler.get_task_code(task))
+        except Exception:
+            # the preview reports the syntax error
+            return set()
+        return set(".".join(part.strip().strip("`") for part in names.split(",")).lower()
+                   for names in relation_pattern.findall(plan.treeString()))
+    return scheduler.get_referenced_names(task) - python_names
+
+
+def get_input_versions(spark, config, graph, needed):
+    """Returns the delta versions of the tables read by the tasks that aren't outputs of the pipeline"""
+    targets = set(node["task"]["output"]["target"].lower() for node in graph.values())
+    names = set()
+    for key in needed:
+        names.update(get_table_names(spark, graph[key]["task"]) - targets)
+    versions = {}
+    for name in sorted(names):
+        try:
+            if not spark.catalog.tableExists(name):
+                continue
+            versions[name] = DeltaTable.forName(spark, name).history(1).select("version").collect()[0][0]
+        except Exception:
+            # tables which aren't delta tables
+            continue
+    return versions
+
+
+def get_preview_key(spark, config, stage, task_name):
+    """Returns the cache key of a task preview and the versions of its input tables"""
+    graph = scheduler.build_task_graph(config)
+    if (stage, task_name) not in graph:
+        return None, None
+    needed = preflight.get_needed_tasks(graph, stage, task_name)
+    input_versions = get_input_versions(spark, config, graph, needed)
+    key = utils.get_config_hash({
+        "pipeline": sandbox.get_pipeline_id(config),
+        "task": [stage, task_name],
+        "hash": sandbox.get_task_hashes(graph, input_versions)[(stage, task_name)]
+    })
+    return key, input_versions
+
+
+def put_result(key, pdf, schema):
+    size = int(pdf.memory_usage(index=True, deep=True).sum())
+    if size > max_cache_bytes:
+        return
+    with lock:
+        if key in results:
+            cache_state["bytes"] -= results.pop(key)[2]
+        results[key] = (pdf, schema, size)
+        cache_state["bytes"] += size
+        while cache_state["bytes"] > max_cache_bytes:
+            evicted_key, evicted = results.popitem(last=False)
+            cache_state["bytes"] -= evicted[2]
+
+
+def run_preview(spark, config, stage, task_name):
+    """Runs a task on the sample data and returns its output as a pandas dataframe with its schema
+
+    The result is reused until the task, one of its upstream tasks or one of
+    the delta tables it reads changes. Returns None if the task isn't found.
+    """
+    key, input_versions = get_preview_key(spark, config, stage, task_name)
+    if key is None:
+        return None
+    with lock:
+        if key in results:
+            results.move_to_end(key)
+            pdf, schema, size = results[key]
+            # a copy, so the caller can't change the cached result
+            return pdf.copy(), schema
+    session, task = sandbox.run_task(spark, config, stage, task_name, input_versions=input_versions)
+    df = dataset.load_task_output(session, config, stage, task)
+    pdf = df.toPandas()
+    put_result(key, pdf, df.schema)
+    return pdf.copy(), df.schema
+
+
+def clear():
+    with lock:
+        results.clear()
+        cache_state["bytes"] = 0
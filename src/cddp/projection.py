@@ -0,0 +1,191 @@
+import os
+import re
+import shutil
+import tempfile
+import threading
+from pyspark.sql.functions import expr
+from pyspark.sql.types import StructType
+import cddp.landing as landing
+import cddp.preflight as preflight
+import cddp.scheduler as scheduler
+import cddp.utils as utils
+
+
+columnar_formats = ["parquet", "orc", "delta"]
+# columns and filters needed by the downstream tasks of each staging target,
+# keyed by the config hash of the pipeline tasks
+projections = {}
+lock = threading.Lock()
+
+
+def is_columnar(task):
+    task_input = task["input"]
+    return task_input["type"] == "deltalake" or landing.is_compacted(task) \
+        or str(task_input.get("format", "")).lower() in columnar_formats
+
+
+def is_prunable(task):
+    """Checks if the columns of a staging task can be pruned to the ones read downstream
+
+    The columns of a view-only output are pruned by default. An output
+    persisted to a table or files would lose its other columns, so it is
+    only pruned with `prune_columns` set in the task input.
+    """
+    if not is_columnar(task):
+        return False
+    prune_columns = task["input"].get("prune_columns")
+    if prune_columns is not None:
+        return prune_columns
+    return set(task["output"]["type"]) == {"view"}
+
+
+def get_scans(df):
+    """Returns the file scans of the physical plan of a dataframe, including the ones of its subqueries
+
+    The subqueries are only planned as physical plans in the executed plan,
+    the session must have adaptive execution off for it to show the scans.
+    """
+    scans = []
+    pending = [df._jdf.queryExecution().executedPlan()]
+    while pending:
+        node = pending.pop()
+        children = node.children()
+        if children.size() == 0 and node.getClass().getSimpleName() == "FileSourceScanExec":
+            scans.append(node)
+        pending += [children.apply(i) for i in range(children.size())]
+        # e.g. a scalar subquery in a filter or a projection reads the staging views too
+        subqueries = node.subqueries()
+        pending += [subqueries.apply(i) for i in range(subqueries.size())]
+    return scans
+
+
+def get_scan_location(scan):
+    paths = scan.relation().location().rootPaths()
+    return paths.apply(0).getName() if paths.size() > 0 else None
+
+
+def get_unqualified_sql(expression):
+    """Returns the SQL of an expression without the view qualifiers of its columns
+
+    The columns resolved through a view keep its name, or the alias of the
+    query, as qualifier, which the dataframe of the staging read doesn't have.
+    """
+    condition = expression.sql()
+    references = expression.references().toSeq()
+    attributes = [references.apply(i) for i in range(references.size())]
+    # longer names first, so a column isn't replaced inside a longer column name
+    for attribute in sorted(attributes, key=lambda attribute: -len(attribute.sql())):
+        if attribute.qualifier().size() == 0:
+            continue
+        name = "`" + attribute.name().replace("`", "``") + "`"
+        condition = re.sub(r"(?<![\w.`])" + re.escape(attribute.sql()) + r"(?![\w`])", lambda m: name, condition)
+    return condition
+
+
+def get_scan_projection(scan):
+    """Returns the columns read by a scan and the SQL condition of its data filters"""
+    columns = list(scan.requiredSchema().fieldNames())
+    data_filters = scan.dataFilters()
+    conditions = [get_unqualified_sql(data_filters.apply(i)) for i in range(data_filters.size())]
+    return columns, " AND ".join(f"({condition})" for condition in conditions) if conditions else None
+
+
+def register_stub_view(session, stub_dir, target, schema):
+    stub_path = os.path.join(stub_dir, target.lower())
+    os.makedirs(stub_path)
+    session.read.schema(schema).parquet("file://" + stub_path).createOrReplaceTempView(target)
+
+
+def get_upstream_staging_targets(graph, key):
+    return set(graph[dep]["task"]["output"]["target"].lower()
+               for dep in preflight.get_needed_tasks(graph, key[0], key[1]) if dep[0] == "staging")
+
+
+def analyze_projections(spark, config):
+    """Analyzes the standard and serving tasks against empty file views of the staging schemas
+
+    The staging targets are stubbed with empty parquet folders, so the
+    optimized plans of the downstream tasks scan them with the columns and
+    filters they need. Each downstream view is registered with its analyzed
+    dataframe, so the serving plans reach the staging scans too. Returns the
+    columns and filter of each prunable staging target, keyed by the lower
+    case target name. The staging targets read by a task which can't be
+    analyzed, e.g. python code, keep all their columns.
+    """
+    graph = scheduler.build_task_graph(config)
+    session = preflight.create_stub_session(spark)
+    # an adaptive plan hides its scans until it runs
+    session.conf.set("spark.sql.adaptive.enabled", "false")
+    stub_dir = tempfile.mkdtemp(prefix="cddp_projection_")
+    staging_targets = {}
+    blocked = set()
+    scans = {}
+    try:
+        for key in scheduler.get_task_order(graph):
+            stage, name = key
+            task = graph[key]["task"]
+            target = task["output"]["target"]
+            if stage == "staging":
+                # without a declared schema, the tasks reading the target can't be analyzed
+                if task.get("schema"):
+                    register_stub_view(session, stub_dir, target, StructType.fromJson(task["schema"]))
+                    staging_targets[target.lower()] = task
+                continue
+            if not preflight.is_analyzable(task):
+                # python code isn't run, the columns it reads are unknown
+                blocked |= get_upstream_staging_targets(graph, key)
+                if task["output"].get("schema"):
+                    register_stub_view(session, stub_dir, target, StructType.fromJson(task["output"]["schema"]))
+                continue
+            try:
+                df = preflight.analyze_task(session, task)
+            except Exception as e:
+                print(f"Cannot analyze the columns read by {stage}.{name}, its staging inputs aren't pruned: {e}")
+                blocked |= get_upstream_staging_targets(graph, key)
+                continue
+            df.createOrReplaceTempView(target)
+            for scan in get_scans(df):
+                location = get_scan_location(scan)
+                if location in staging_targets:
+                    scans.setdefault(location, []).append(get_scan_projection(scan))
+    finally:
+        shutil.rmtree(stub_dir, ignore_errors=True)
+
+    results = {}
+    for target, task in staging_targets.items():
+        if not is_prunable(task) or target not in scans or target in blocked:
+            continue
+        schema = StructType.fromJson(task["schema"])
+        needed = set(column for columns, _ in scans[target] for column in columns)
+        # a count(*) reads no columns, the first one is kept to keep the rows
+        columns = [name for name in schema.fieldNames() if name in needed] or schema.fieldNames()[:1]
+        conditions = [condition for _, condition in scans[target]]
+        # the rows are only filtered if every scan filters them
+        condition = None if None in conditions else " OR ".join(f"({c})" for c in sorted(set(conditions)))
+        results[target] = {"columns": columns, "filter": condition}
+    return results
+
+
+def get_projections(spark, config):
+    key = utils.get_config_hash([config.get(stage, []) for stage in ["staging", "standard", "serving"]])
+    with lock:
+        if key in projections:
+            return projections[key]
+    result = analyze_projections(spark, config)
+    with lock:
+        projections[key] = result
+    return result
+
+
+def apply_projection(spark, config, task, df):
+    """Filters the input dataframe of a staging task and selects the columns read downstream"""
+    if not is_prunable(task):
+        return df
+    projection = get_projections(spark, config).get(task["output"]["target"].lower())
+    if projection is None:
+        return df
+    if projection["filter"] is not None:
+        df = df.where(expr(projection["filter"]))
+    if len(projection["columns"]) < len(df.columns):
+        print(f"Reading {len(projection['columns'])} of {len(df.columns)} columns of {task['name']}: {projection['columns']}")
+    return df.select(*projection["columns"])
@@ -0,0 +1,125 @@
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+import cddp
+import cddp.preflight as preflight
+import cddp.scheduler as scheduler
+import cddp.utils as utils
+import cddp.view_cache as view_cache
+
+
+# sandboxes of the interactive "try" requests, keyed by pipeline id
+sandboxes = OrderedDict()
+max_sandboxes = 8
+lock = threading.Lock()
+
+
+def get_pipeline_id(config):
+    return config.get("id", config["name"])
+
+
+def get_sandbox(spark, config):
+    """Returns the sandbox of a pipeline, a session with its own temp views and working dir"""
+    pipeline_id = get_pipeline_id(config)
+    evicted = []
+    with lock:
+        if pipeline_id in sandboxes:
+            sandboxes.move_to_end(pipeline_id)
+            return sandboxes[pipeline_id]
+        sandbox = {
+            "id": pipeline_id,
+            "session": spark.newSession(),
+            "working_dir": tempfile.mkdtemp(prefix="cddp_sandbox_"),
+            "config": None,
+            "hashes": {},
+            "lock": threading.RLock()
+        }
+        sandboxes[pipeline_id] = sandbox
+        while len(sandboxes) > max_sandboxes:
+            evicted.append(sandboxes.popitem(last=False)[1])
+    for old_sandbox in evicted:
+        release_sandbox(old_sandbox)
+    return sandbox
+
+
+def release_sandbox(sandbox):
+    """Drops the database, the cached views and the working dir of a sandbox"""
+    with sandbox["lock"]:
+        if sandbox["config"] is not None:
+            cddp.clean_database(sandbox["session"], sandbox["config"])
+        view_cache.release(sandbox["session"])
+        shutil.rmtree(sandbox["working_dir"], True)
+
+
+def get_task_hashes(graph, input_versions=None):
+    """Returns the hash of each task config chained with the hashes of its upstream tasks
+
+    input_versions, the versions of the tables read from outside the
+    pipeline, are part of every hash.
+    """
+    hashes = {}
+    for key in scheduler.get_task_order(graph):
+        node = graph[key]
+        hashes[key] = utils.get_config_hash({
+            "task": node["task"],
+            "upstream": sorted(hashes[dep] for dep in node["depends_on"]),
+            "inputs": input_versions or {}
+        })
+    return hashes
+
+
+def clear_task_output(session, config, stage, task):
+    output_type = task["output"]["type"]
+    target = task["output"]["target"]
+    if "table" in output_type:
+        session.sql(f"DROP TABLE IF EXISTS {target}")
+    stage_path = config[f"{stage}_path"]
+    for path in [stage_path+"/"+target, stage_path+"/data/"+target, stage_path+"/chkpt/"+target]:
+        shutil.rmtree(path, True)
+
+
+def build_task(session, config, stage, task, timeout=None):
+    clear_task_output(session, config, stage, task)
+    if stage == "staging":
+        if "sampleData" in task:
+            cddp.init_staging_sample_task(session, config, task, in_memory=True)
+    elif stage == "standard":
+        cddp.start_standard_job(session, config, task, False, True, timeout)
+    elif stage == "serving":
+        cddp.start_serving_job(session, config, task, False, True, timeout)
+
+
+def run_task(spark, config, stage, task_name, timeout=None, input_versions=None):
+    """Runs a task of the pipeline against the sample data in the sandbox of the pipeline
+
+    The first request creates the database and stages the sample data. Later
+    requests only rebuild the task and its upstream tasks whose config, or
+    the config of one of their own upstream tasks, changed since they were
+    built. Returns the sandbox session and the task, None if the task isn't
+    in the pipeline.
+    """
+    sandbox = get_sandbox(spark, config)
+    session = sandbox["session"]
+    with sandbox["lock"]:
+        cddp.init(session, config, sandbox["working_dir"]+"/"+config["name"])
+        if sandbox["config"] is None or sandbox["config"]["name"] != config["name"]:
+            cddp.clean_database(session, config)
+            sandbox["hashes"] = {}
+        sandbox["config"] = config
+        cddp.init_database(session, config)
+
+        graph = scheduler.build_task_graph(config)
+        if (stage, task_name) not in graph:
+            return None
+        needed = preflight.get_needed_tasks(graph, stage, task_name)
+        hashes = get_task_hashes(graph, input_versions)
+        for key in scheduler.get_task_order(graph):
+            if key not in needed or sandbox["hashes"].get(key) == hashes[key]:
+                continue
+            # a failed task is rebuilt by the next request
+            sandbox["hashes"].pop(key, None)
+            print(f"[sandbox] building {key[0]} task: {key[1]}")
+            build_task(session, config, key[0], graph[key]["task"], timeout)
+            sandbox["hashes"][key] = hashes[key]
+        return session, graph[(stage, task_name)]["task"]
@@ -0,0 +1,141 @@
+import contextvars
+import re
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+STAGES = ["staging", "standard", "serving"]
+
+identifier_pattern = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+
+def get_task_code(task):
+    """Returns the SQL or python code of a task as a single string"""
+    if "code" not in task:
+        return ""
+    code = task["code"]
+    lang = code.get("lang", "sql")
+    text = code.get(lang, "")
+    if isinstance(text, list):
+        text = " \n".join(text)
+    return text
+
+
+def get_referenced_names(task):
+    """Returns the lower-cased identifiers referenced in the code of a task"""
+    return set(name.lower() for name in identifier_pattern.findall(get_task_code(task)))
+
+
+def build_task_graph(config, stage_arg=None, task_arg=None):
+    """Builds the dependency graph of the pipeline tasks
+
+    A task depends on the tasks listed in its `dependency` list and on the
+    tasks whose output target is referenced in its code. Only tasks of the
+    same or an earlier stage can be dependencies. The graph is a dict keyed
+    by (stage, task name), in config order.
+    """
+    graph = {}
+    targets = {}
+    names = {}
+    for stage_index, stage in enumerate(STAGES):
+        for task in config.get(stage, []):
+            key = (stage, task["name"])
+            graph[key] = {
+                "stage": stage,
+                "stage_index": stage_index,
+                "task": task,
+                "depends_on": set()
+            }
+            names[task["name"].lower()] = key
+            if "output" in task and "target" in task["output"]:
+                targets[task["output"]["target"].lower()] = key
+
+    for key, node in graph.items():
+        referenced = get_referenced_names(node["task"])
+        dependency = node["task"].get("dependency", [])
+        for dep in dependency:
+            if dep.lower() in names:
+                node["depends_on"].add(names[dep.lower()])
+            else:
+                print(f"Ignoring unknown dependency {dep} of task {key[1]}")
+        for name in referenced:
+            if name in targets:
+                node["depends_on"].add(targets[name])
+        node["depends_on"] = set(
+            dep for dep in node["depends_on"]
+            if dep != key and graph[dep]["stage_index"] <= node["stage_index"])
+
+    selected = [key for key, node in graph.items()
+                if (stage_arg is None or node["stage"] == stage_arg)
+                and (task_arg is None or key[1] == task_arg)]
+    graph = {key: graph[key] for key in selected}
+    for node in graph.values():
+        node["depends_on"] = set(dep for dep in node["depends_on"] if dep in graph)
+
+    check_acyclic(graph)
+    return graph
+
+
+def check_acyclic(graph):
+    """Raises an exception if the task graph has a dependency cycle"""
+    get_task_order(graph)
+
+
+def get_task_order(graph):
+    """Returns the keys of the graph in dependency order, raises if there is a cycle"""
+    done = set()
+    order = []
+    remaining = dict((key, set(node["depends_on"])) for key, node in graph.items())
+    while remaining:
+        ready = [key for key, deps in remaining.items() if deps <= done]
+        if not ready:
+            cycle = ", ".join(f"{stage}.{name}" for stage, name in remaining)
+            raise Exception(f"Cyclic dependency between tasks: {cycle}")
+        for key in ready:
+            done.add(key)
+            order.append(key)
+            del remaining[key]
+    return order
+
+
+def run_task_graph(spark, graph, run_task, parallelism=1):
+    """Runs the tasks of the graph, submitting independent tasks in parallel
+
+    `run_task(stage, task)` is called from a thread pool of `parallelism`
+    workers as soon as all dependencies of a task have finished. Each stage
+    runs in its own Spark fair-scheduler pool. Returns the results keyed by
+    (stage, task name).
+    """
+    pending = dict((key, node["depends_on"]) for key, node in graph.items())
+    done = set()
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, parallelism)) as executor:
+        running = {}
+        while pending or running:
+            ready = [key for key, deps in pending.items() if deps <= done]
+            for key in ready:
+                del pending[key]
+                node = graph[key]
+                # the tasks run in a copy of the context of the run, e.g. its streaming run
+                future = executor.submit(contextvars.copy_context().run, run_in_pool, spark, node["stage"], node["task"], run_task)
+                running[future] = key
+            if not running:
+                raise Exception("Cyclic dependency between tasks: " + ", ".join(f"{stage}.{name}" for stage, name in pending))
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                key = running.pop(future)
+                error = future.exception()
+                if error is not None:
+                    pending.clear()
+                    print(f"Task {key[0]}.{key[1]} failed: {error}")
+                    raise error
+                results[key] = future.result()
+                done.add(key)
+    return results
+
+
+def run_in_pool(spark, stage, task, run_task):
+    spark.sparkContext.setLocalProperty("spark.scheduler.pool", f"cddp_{stage}")
+    try:
+        return run_task(stage, task)
+    finally:
+        spark.sparkContext.setLocalProperty("spark.scheduler.pool", None)
@@ -0,0 +1,135 @@
+import csv
+import io
+import json
+import threading
+from collections import OrderedDict
+from pyspark.sql.types import StructType
+import cddp.utils as utils
+
+
+# inferred schemas, keyed by the fingerprint of their source: the path, size
+# and modification time of the files, or the hash of the uploaded data
+inferred_schemas = OrderedDict()
+max_inferred_schemas = 256
+default_sample_rows = 1000
+lock = threading.Lock()
+
+
+def resolve_schema(spark, task, paths=None):
+    """Returns the declared schema of a task, or the schema inferred from a sample of its input files"""
+    if task.get("schema"):
+        return StructType.fromJson(task["schema"])
+    task_input = task["input"]
+    return infer_file_schema(spark, paths if paths is not None else task_input["path"], task_input["format"],
+                             task_input.get("options"), task_input.get("schema_sample_rows", default_sample_rows))
+
+
+def get_cached_schema(key, infer):
+    with lock:
+        if key in inferred_schemas:
+            inferred_schemas.move_to_end(key)
+            return inferred_schemas[key]
+    schema = infer()
+    with lock:
+        inferred_schemas[key] = schema
+        while len(inferred_schemas) > max_inferred_schemas:
+            inferred_schemas.popitem(last=False)
+    return schema
+
+
+def get_source_status(spark, paths):
+    """Returns the path, size and modification time of paths, which may be globs, without listing folders
+
+    A folder changes its modification time when a file is added directly
+    into it, e.g. on HDFS, ADLS Gen2 or local disks, so the pruned data
+    folders of a read fingerprint their files.
+    """
+    make_path = spark._jvm.org.apache.hadoop.fs.Path
+    statuses = []
+    for path in paths:
+        hadoop_path = make_path(path)
+        fs = hadoop_path.getFileSystem(spark._jsc.hadoopConfiguration())
+        for status in fs.globStatus(hadoop_path) or []:
+            statuses.append([status.getPath().toString(), status.getLen(), status.getModificationTime()])
+    statuses.sort()
+    return statuses
+
+
+def get_reader_options(options):
+    # inferSchema is set by the sampling reader itself, and the sampled
+    # lines are read as single records
+    return dict((key, value) for key, value in (options or {}).items()
+                if key.lower() not in ["inferschema", "multiline", "samplingratio"])
+
+
+def infer_file_schema(spark, paths, format, options=None, sample_rows=default_sample_rows):
+    """Infers the schema of files from their first sample_rows rows
+
+    CSV and JSON lines files are sampled by line, multiline JSON files by
+    file. Other formats store their schema and aren't scanned.
+    """
+    paths = paths if isinstance(paths, list) else [paths]
+    if len(paths) == 0:
+        return StructType([])
+    options = dict(options or {})
+    key = utils.get_config_hash({
+        "files": get_source_status(spark, paths),
+        "format": format,
+        "options": options,
+        "sample_rows": sample_rows
+    })
+
+    def infer():
+        print(f"Inferring the schema of {paths} from {sample_rows} rows")
+        multiline = str(options.get("multiline", options.get("multiLine", "false"))).lower() == "true"
+        if format == "csv":
+            lines = spark.read.text(paths).limit(sample_rows + 1)
+            return spark.read.option("header", "true").options(**get_reader_options(options)) \
+                .option("inferSchema", "true") \
+                .csv(lines.rdd.map(lambda row: row.value)).schema
+        if format == "json":
+            documents = spark.read.text(paths, wholetext=multiline).limit(sample_rows)
+            return spark.read.options(**get_reader_options(options)) \
+                .json(documents.rdd.map(lambda row: row.value)).schema
+        return spark.read.format(format).options(**options).load(paths).schema
+    return get_cached_schema(key, infer)
+
+
+def get_sample_records(data_str, format, sample_rows):
+    """Returns the first sample_rows records of uploaded data as JSON strings or CSV lines"""
+    if format == "json":
+        rows = json.loads(data_str)
+        rows = rows if isinstance(rows, list) else [rows]
+        return [json.dumps(row) for row in rows[:sample_rows]]
+    if format == "csv":
+        records = []
+        # parsed with the csv module to keep quoted line breaks in their record
+        for i, record in enumerate(csv.reader(io.StringIO(data_str))):
+            if i > sample_rows:
+                break
+            line = io.StringIO()
+            csv.writer(line).writerow(record)
+            records.append(line.getvalue().rstrip("\r\n"))
+        return records
+    raise Exception("Unsupported sample data format: " + format)
+
+
+def infer_data_schema(spark, data_str, format="json", sample_rows=default_sample_rows):
+    """Infers the schema of uploaded sample data from its first sample_rows records"""
+    key = utils.get_config_hash({
+        "data": utils.get_config_hash(data_str),
+        "format": format,
+        "sample_rows": sample_rows
+    })
+
+    def infer():
+        records = spark.sparkContext.parallelize(get_sample_records(data_str, format, sample_rows))
+        if format == "csv":
+            return spark.read.option("header", "true").option("inferSchema", "true").csv(records).schema
+        return spark.read.json(records).schema
+    return get_cached_schema(key, infer)
+
+
+def clear():
+    with lock:
+        inferred_schemas.clear()
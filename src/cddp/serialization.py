@@ -0,0 +1,84 @@
+import base64
+import datetime
+import decimal
+import pyarrow as pa
+
+
+result_formats = ["records", "columns", "arrow"]
+arrow_mimetype = "application/vnd.apache.arrow.stream"
+
+
+def collect_as_arrow(df):
+    """Collects a dataframe as an Arrow table, through toPandas if the Arrow collect isn't available"""
+    try:
+        batches = df._collect_as_arrow()
+        if batches:
+            return pa.Table.from_batches(batches)
+        return pa.Table.from_pandas(df.toPandas(), preserve_index=False)
+    except Exception as e:
+        print(f"Cannot collect the dataframe with Arrow, using toPandas: {e}")
+        return pa.Table.from_pandas(df.toPandas(), preserve_index=False)
+
+
+def to_json_value(value):
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode()
+    if isinstance(value, dict):
+        return dict((key, to_json_value(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return [to_json_value(item) for item in value]
+    return value
+
+
+def needs_conversion(arrow_type):
+    """Checks if the values of a column aren't JSON types already"""
+    return not (pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type)
+                or pa.types.is_boolean(arrow_type) or pa.types.is_string(arrow_type)
+                or pa.types.is_large_string(arrow_type) or pa.types.is_null(arrow_type))
+
+
+def get_json_columns(table):
+    """Returns the columns of an Arrow table as JSON serializable lists, keyed by column name"""
+    columns = {}
+    for field, column in zip(table.schema, table.columns):
+        values = column.to_pylist()
+        if needs_conversion(field.type):
+            values = [to_json_value(value) for value in values]
+        columns[field.name] = values
+    return columns
+
+
+def to_arrow_ipc(table):
+    """Serializes an Arrow table in the Arrow IPC stream format"""
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as stream_writer:
+        stream_writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def serialize_dataframe(df, format="records", offset=0):
+    """Collects a dataframe with Arrow and serializes its rows from offset"""
+    if format not in result_formats:
+        raise Exception(f"Invalid result format {format}, expecting one of {result_formats}")
+    return serialize_table(collect_as_arrow(df).slice(offset), format)
+
+
+def serialize_table(table, format="records"):
+    """Serializes an Arrow table
+
+    records: a list of row dicts, columns: a dict of column value lists,
+    arrow: the bytes of an Arrow IPC stream.
+    """
+    if format not in result_formats:
+        raise Exception(f"Invalid result format {format}, expecting one of {result_formats}")
+    if format == "arrow":
+        return to_arrow_ipc(table)
+    columns = get_json_columns(table)
+    if format == "columns":
+        return columns
+    names = list(columns.keys())
+    return [dict(zip(names, row)) for row in zip(*columns.values())]
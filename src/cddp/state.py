@@ -0,0 +1,56 @@
+import json
+import os
+import cddp.utils as utils
+
+
+def get_local_path(path):
+    """Maps a dbfs:/ path to its local /dbfs mount"""
+    if path.startswith("dbfs:/"):
+        path = "/dbfs/" + path[len("dbfs:/"):]
+    return path
+
+
+def get_state_dir(config):
+    """Returns the folder of the state store, under the app data path of the working dir"""
+    return get_local_path(f"{config['app_data_path']}_state")
+
+
+def get_state_path(config, task):
+    return f"{get_state_dir(config)}/{task['name']}.json"
+
+
+def get_listing_cache_path(config, path):
+    """Returns the file of the listing index of a landing path, in the working dir"""
+    return get_local_path(f"{config['working_dir']}/_listing_cache/{utils.get_config_hash(path)}.json")
+
+
+def get_landing_state_path(config, task):
+    """Returns the file of the landed files converted to the compact landing copy of a task"""
+    return f"{get_state_dir(config)}/{task['name']}_landing.json"
+
+
+def load_task_state(config, task):
+    """Loads the saved state of a task, an empty dict if the task never ran"""
+    return load_json(get_state_path(config, task))
+
+
+def save_task_state(config, task, state):
+    """Saves the state of a task, the file is replaced atomically"""
+    save_json(get_state_path(config, task), state)
+
+
+def load_json(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def save_json(path, obj):
+    folder = os.path.dirname(path)
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(obj, f, default=str)
+    os.replace(tmp_path, path)
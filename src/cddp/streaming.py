@@ -0,0 +1,264 @@
+import contextvars
+import json
+import re
+import signal
+import threading
+import time
+
+
+trigger_modes = ["processingTime", "availableNow", "once"]
+rate_limits = ["maxFilesPerTrigger", "maxBytesPerTrigger", "maxOffsetsPerTrigger"]
+
+# reader options of the rate limits supported by each streaming source
+source_rate_limit_options = {
+    "filestore": {"maxFilesPerTrigger": "maxFilesPerTrigger"},
+    "deltalake": {"maxFilesPerTrigger": "maxFilesPerTrigger", "maxBytesPerTrigger": "maxBytesPerTrigger"},
+    "autoloader": {"maxFilesPerTrigger": "cloudFiles.maxFilesPerTrigger", "maxBytesPerTrigger": "cloudFiles.maxBytesPerTrigger"},
+    "azure_eventhub": {"maxOffsetsPerTrigger": "maxEventsPerTrigger"}
+}
+
+byte_size_pattern = re.compile(r"^\d+\s*[kmgt]?b?$", re.IGNORECASE)
+
+# the managed run of the current context, each pipeline run has its own
+# queries, even when several runs share the process, e.g. in the app
+current_run = contextvars.ContextVar("cddp_streaming_run", default=None)
+# the managed runs in progress, stopped together on SIGTERM
+active_runs = []
+lock = threading.Lock()
+
+
+def apply_trigger(stream_writer, task):
+    """Applies the trigger of the task output to a stream writer"""
+    trigger = task.get("output", {}).get("trigger")
+    if trigger is None:
+        return stream_writer
+    return stream_writer.trigger(**get_trigger_args(trigger))
+
+
+def get_trigger_args(trigger):
+    """Converts a trigger config, e.g. {"processingTime": "10 seconds"}, to the args of DataStreamWriter.trigger"""
+    if not isinstance(trigger, dict) or len(trigger) != 1 or list(trigger.keys())[0] not in trigger_modes:
+        raise Exception(f"Invalid trigger {trigger}, expecting one of {trigger_modes}")
+    mode, value = list(trigger.items())[0]
+    if mode == "processingTime":
+        if not isinstance(value, str) or not value.strip():
+            raise Exception(f"Invalid trigger {trigger}, processingTime must be an interval like '10 seconds'")
+        return {"processingTime": value}
+    # DataStreamWriter.trigger rejects availableNow=False and once=False
+    if value is not True:
+        raise Exception(f"Invalid trigger {trigger}, {mode} must be true")
+    return {mode: True}
+
+
+def get_source_options(task):
+    """Returns the reader options of the rate limits set on the task input"""
+    input_conf = task.get("input", {})
+    options = {}
+    for key, option in source_rate_limit_options.get(input_conf.get("type"), {}).items():
+        if key in input_conf:
+            options[option] = str(input_conf[key])
+    return options
+
+
+def is_streaming_source(task):
+    input_conf = task.get("input", {})
+    return input_conf.get("type") in ["autoloader", "azure_eventhub"] \
+        or input_conf.get("read-type") == "streaming"
+
+
+def get_streaming_tasks(config):
+    """Returns the (stage, task, is source, is sink) of the streaming tasks of a pipeline"""
+    tasks = []
+    for task in config.get("staging", []):
+        if is_streaming_source(task):
+            tasks.append(("staging", task, True, True))
+    for stage in ["standard", "serving"]:
+        for task in config.get(stage, []):
+            if task.get("type") == "streaming":
+                tasks.append((stage, task, False, True))
+    return tasks
+
+
+def apply_streaming_defaults(config):
+    """Fills the trigger and rate limits missing on streaming tasks from the pipeline `streaming` block"""
+    defaults = config.get("streaming", {})
+    for stage, task, is_source, is_sink in get_streaming_tasks(config):
+        if is_sink and "trigger" in defaults and "trigger" not in task["output"]:
+            task["output"]["trigger"] = defaults["trigger"]
+        if is_source:
+            supported = source_rate_limit_options.get(task["input"].get("type"), {})
+            for key in rate_limits:
+                if key in defaults and key in supported and key not in task["input"]:
+                    task["input"][key] = defaults[key]
+
+
+def validate_streaming_config(config):
+    """Checks the triggers and rate limits of the pipeline, raises with all the errors found"""
+    errors = []
+    if "trigger" in config.get("streaming", {}):
+        errors += validate_trigger("streaming", config["streaming"]["trigger"])
+    for key in rate_limits:
+        if key in config.get("streaming", {}):
+            errors += validate_rate_limit("streaming", key, config["streaming"][key])
+    for stage, task, is_source, is_sink in get_streaming_tasks(config):
+        name = f"{stage}.{task['name']}"
+        if "trigger" in task.get("output", {}):
+            errors += validate_trigger(name, task["output"]["trigger"])
+        if is_source:
+            supported = source_rate_limit_options.get(task["input"].get("type"), {})
+            for key in rate_limits:
+                if key not in task["input"]:
+                    continue
+                if key not in supported:
+                    errors.append(f"{name}: {key} is not supported by input type {task['input'].get('type')}")
+                else:
+                    errors += validate_rate_limit(name, key, task["input"][key])
+    if errors:
+        raise Exception("Invalid streaming config:\n" + "\n".join(errors))
+
+
+def validate_trigger(name, trigger):
+    try:
+        get_trigger_args(trigger)
+    except Exception as e:
+        return [f"{name}: {e}"]
+    return []
+
+
+def validate_rate_limit(name, key, value):
+    if key == "maxBytesPerTrigger":
+        if isinstance(value, int) and not isinstance(value, bool) and value > 0 \
+                or isinstance(value, str) and byte_size_pattern.match(value.strip()):
+            return []
+        return [f"{name}: {key} must be a positive size like 1048576 or '1g'"]
+    if isinstance(value, int) and not isinstance(value, bool) and value > 0:
+        return []
+    return [f"{name}: {key} must be a positive integer"]
+
+
+def get_query_id(spark, checkpoint_location):
+    """Returns the id of the streaming query of a checkpoint, from its metadata file
+
+    The id is kept while the query restarts from the checkpoint, and a new
+    one is created when the checkpoint is reset.
+    """
+    jvm = spark._jvm
+    hadoop_path = jvm.org.apache.hadoop.fs.Path(checkpoint_location.rstrip("/") + "/metadata")
+    stream = hadoop_path.getFileSystem(spark._jsc.hadoopConfiguration()).open(hadoop_path)
+    try:
+        reader = jvm.java.io.BufferedReader(jvm.java.io.InputStreamReader(stream, "UTF-8"))
+        return json.loads(reader.readLine())["id"]
+    finally:
+        stream.close()
+
+
+def register_query(query, task, timeout=None):
+    """Tracks a started streaming query
+
+    In a managed run the query keeps running and is awaited with the other
+    queries of the run by await_queries. Otherwise it is awaited right away
+    and stopped once the timeout expires.
+    """
+    timeout = task.get("output", {}).get("timeout", timeout)
+    run = current_run.get()
+    if run is not None:
+        with lock:
+            run["queries"].append({
+                "query": query,
+                "task": task,
+                "timeout": timeout,
+                "started": time.time()
+            })
+    elif timeout is not None:
+        query.awaitTermination(timeout)
+        query.stop()
+    return query
+
+
+def begin_run():
+    """Starts a managed run in the current context and returns it
+
+    The queries of the run are awaited together and stopped on SIGTERM. The
+    tasks of the run must run in a copy of the context, e.g. with
+    contextvars.copy_context().run, to register their queries to it.
+    """
+    run = {"queries": [], "previous_handler": None}
+    run["token"] = current_run.set(run)
+    with lock:
+        active_runs.append(run)
+    if threading.current_thread() is threading.main_thread():
+        run["previous_handler"] = signal.signal(signal.SIGTERM, handle_sigterm)
+    return run
+
+
+def end_run(run):
+    """Ends the managed run, the queries without timeout keep running"""
+    current_run.reset(run["token"])
+    with lock:
+        active_runs.remove(run)
+    if run["previous_handler"] is not None:
+        signal.signal(signal.SIGTERM, run["previous_handler"])
+        run["previous_handler"] = None
+
+
+def handle_sigterm(signum, frame):
+    print("[streaming] SIGTERM received, stopping streaming queries")
+    with lock:
+        runs = list(active_runs)
+    for run in runs:
+        stop_queries(run)
+    raise SystemExit(128 + signum)
+
+
+def stop_queries(run=None):
+    """Stops all active streaming queries of the run, by default the run of the current context"""
+    run = run if run is not None else current_run.get()
+    if run is None:
+        return
+    with lock:
+        running = [item["query"] for item in run["queries"]]
+    for query in running:
+        if query.isActive:
+            query.stop()
+
+
+def await_queries(poll_interval=1, run=None):
+    """Waits for the streaming queries of the run, by default the run of the current context
+
+    Each query is stopped once its own timeout expires, counted from its
+    start. Queries without timeout are only awaited when they terminate by
+    themselves (availableNow or once triggers). Raises the first query error.
+    """
+    run = run if run is not None else current_run.get()
+    if run is None:
+        return
+    with lock:
+        pending = list(run["queries"])
+    errors = []
+    while pending:
+        now = time.time()
+        remaining = []
+        for item in pending:
+            query = item["query"]
+            if not query.isActive:
+                if query.exception() is not None:
+                    errors.append(query.exception())
+                continue
+            if item["timeout"] is not None and now >= item["started"] + item["timeout"]:
+                print(f"[streaming] stopping query of task {item['task']['name']} after {item['timeout']} seconds")
+                query.stop()
+                continue
+            if item["timeout"] is None and not is_self_terminating(item["task"]):
+                continue
+            remaining.append(item)
+        pending = remaining
+        if errors:
+            stop_queries(run)
+            raise errors[0]
+        if pending:
+            time.sleep(poll_interval)
+
+
+def is_self_terminating(task):
+    trigger = task.get("output", {}).get("trigger", {})
+    return bool(trigger.get("availableNow", False) or trigger.get("once", False))
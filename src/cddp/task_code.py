@@ -0,0 +1,83 @@
+import argparse
+import builtins
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from delta import configure_spark_with_delta_pip
+from delta.tables import DeltaTable
+from pyspark.sql import SparkSession
+import pyspark.sql.functions as F
+import pyspark.sql.types as T
+import cddp.ingestion as cddp_ingestion
+import cddp.utils as utils
+
+
+# compiled python code of the tasks, keyed by the config hash of the task code
+compiled_code = OrderedDict()
+max_compiled_code = 256
+lock = threading.Lock()
+
+
+def get_source(task, lang):
+    source = task["code"][lang]
+    if isinstance(source, list):
+        source = " \n".join(source)
+    return source
+
+
+def get_compiled_code(task):
+    """Returns the code object of the python code of a task, compiled once per config hash"""
+    key = utils.get_config_hash(task["code"])
+    with lock:
+        if key in compiled_code:
+            compiled_code.move_to_end(key)
+            return compiled_code[key]
+    code = compile(get_source(task, "python"), f"<task {task['name']}>", "exec")
+    with lock:
+        compiled_code[key] = code
+        while len(compiled_code) > max_compiled_code:
+            compiled_code.popitem(last=False)
+    return code
+
+
+def get_namespace(spark, task):
+    """Returns the globals the python code of a task runs with
+
+    The names the code of the tasks could use when it ran in the cddp module
+    are kept, e.g. os, time and DeltaTable.
+    """
+    namespace = dict((name, getattr(T, name)) for name in T.__all__)
+    namespace.update({
+        "__builtins__": builtins,
+        "__name__": f"cddp_task_{task['name']}",
+        "argparse": argparse,
+        "cddp_ingestion": cddp_ingestion,
+        "configure_spark_with_delta_pip": configure_spark_with_delta_pip,
+        "DeltaTable": DeltaTable,
+        "json": json,
+        "os": os,
+        "shutil": shutil,
+        "SparkSession": SparkSession,
+        "tempfile": tempfile,
+        "time": time,
+        "utils": utils,
+        "uuid": uuid,
+        "F": F,
+        "spark": spark,
+        "task": task
+    })
+    return namespace
+
+
+def run_python_code(spark, task):
+    """Runs the python code of a task and returns the output_df it sets"""
+    namespace = get_namespace(spark, task)
+    exec(get_compiled_code(task), namespace)
+    if "output_df" not in namespace:
+        raise Exception(f"The python code of task {task['name']} does not set output_df")
+    return namespace["output_df"]
@@ -1,6 +1,7 @@
 import os
 import json
 import csv
+import hashlib
 
 def json_to_csv(jsondata, output_path): 
     data_file = open(output_path, 'w', newline='')
@@ -28,6 +29,11 @@ def get_path_for_current_env(input_type, path):
             path=path[1:]
     return path
 
+def get_config_hash(config):
+    """Returns a stable hash of a task or pipeline config"""
+    config_str = json.dumps(config, sort_keys=True, default=str)
+    return hashlib.sha256(config_str.encode()).hexdigest()
+
 if __name__ == "__main__":
     jsondata = [{"id": 1, "name": "John", "age": 30}, {"id": 2, "name": "Peter", "age": 25}, {"id": 3, "name": "Mary", "age": 28}]
     output_path = "data.csv"
@@ -0,0 +1,90 @@
+import threading
+from pyspark import StorageLevel
+import cddp.utils as utils
+
+
+# views registered in the current run, keyed by (spark session, task name)
+registered_views = {}
+persisted_dfs = []
+# persisted dataframe of each registered view, keyed by (spark session, lower case target)
+view_dfs = {}
+lock = threading.Lock()
+task_locks = {}
+
+
+def get_view_key(spark, task):
+    return (id(spark), task["name"])
+
+
+def get_task_lock(spark, task):
+    """Returns the lock guarding the registration of the view of a task"""
+    key = get_view_key(spark, task)
+    with lock:
+        if key not in task_locks:
+            task_locks[key] = threading.RLock()
+        return task_locks[key]
+
+
+def is_registered(spark, task):
+    """Checks if the view of the task is registered with its current config"""
+    key = get_view_key(spark, task)
+    with lock:
+        return registered_views.get(key) == utils.get_config_hash(task)
+
+
+def persist_dataframe(spark, df, task):
+    """Persists a batch dataframe with the storage level of the task output, if any"""
+    output = task["output"]
+    if df.isStreaming or df.is_cached:
+        return df
+    if "storage_level" in output:
+        df = df.persist(getattr(StorageLevel, output["storage_level"].upper()))
+    elif output.get("cache", False):
+        df = df.cache()
+    else:
+        return df
+    track_persisted(spark, df)
+    return df
+
+
+def track_persisted(spark, df):
+    """Records a persisted dataframe to unpersist at the end of the run"""
+    with lock:
+        persisted_dfs.append((id(spark), df))
+
+
+def register_view(spark, task, df):
+    """Registers the output view of a task and records it for the current run"""
+    target = task["output"]["target"]
+    df = persist_dataframe(spark, df, task)
+    replace_view_df(spark, target, df)
+    df.createOrReplaceTempView(target)
+    with lock:
+        registered_views[get_view_key(spark, task)] = utils.get_config_hash(task)
+    return df
+
+
+def replace_view_df(spark, target, df):
+    """Unpersists the dataframe of a view replaced by df, e.g. when a task is tried again"""
+    key = (id(spark), target.lower())
+    with lock:
+        previous = view_dfs.pop(key, None)
+        if df.is_cached:
+            view_dfs[key] = df
+        if previous is None or previous is df:
+            return
+        persisted_dfs[:] = [item for item in persisted_dfs if item[1] is not previous]
+    previous.unpersist()
+
+
+def release(spark):
+    """Unpersists the cached views and forgets the views registered by the run"""
+    with lock:
+        for key in [key for key in registered_views if key[0] == id(spark)]:
+            del registered_views[key]
+        for key in [key for key in view_dfs if key[0] == id(spark)]:
+            del view_dfs[key]
+        dfs = [df for session_id, df in persisted_dfs if session_id == id(spark)]
+        persisted_dfs[:] = [item for item in persisted_dfs if item[0] != id(spark)]
+    for df in dfs:
+        df.unpersist()
@@ -0,0 +1,128 @@
+from delta.tables import DeltaTable
+from pyspark.sql.functions import lit
+
+
+default_storage_format = "delta"
+storage_formats = ["delta", "parquet", "orc"]
+
+
+def get_storage_format(task):
+    """Returns the storage format of the task output"""
+    storage_format = task.get("output", {}).get("format", default_storage_format)
+    if storage_format not in storage_formats:
+        raise Exception("Unknown output format: " + storage_format)
+    return storage_format
+
+
+def prepare_dataframe(df, task):
+    """Applies the repartition, coalesce and clustering hints of the task output"""
+    output = task.get("output", {})
+    if "repartition" in output:
+        repartition = output["repartition"]
+        if isinstance(repartition, list):
+            df = df.repartition(*repartition)
+        else:
+            df = df.repartition(int(repartition))
+    if "coalesce" in output:
+        df = df.coalesce(int(output["coalesce"]))
+    # without delta Z-ordering, the rows are clustered inside each file instead
+    if "zorder_by" in output and get_storage_format(task) != "delta" and not df.isStreaming:
+        df = df.sortWithinPartitions(*output["zorder_by"])
+    return df
+
+
+def configure_writer(writer, task):
+    """Applies the format and the write options of the task output to a batch or stream writer"""
+    output = task.get("output", {})
+    storage_format = get_storage_format(task)
+    writer = writer.format(storage_format)
+    if storage_format == "delta":
+        writer = writer.option("overwriteSchema", "true")
+    if "partition_by" in output:
+        writer = writer.partitionBy(*output["partition_by"])
+    if "compression" in output:
+        writer = writer.option("compression", output["compression"])
+    if "max_records_per_file" in output:
+        writer = writer.option("maxRecordsPerFile", int(output["max_records_per_file"]))
+    if "options" in output and output["options"] is not None:
+        writer = writer.options(**output["options"])
+    return writer
+
+
+def optimize_output(spark, task, table_name=None, path=None):
+    """Applies the delta table layout options of the task output after a batch write"""
+    output = task.get("output", {})
+    if get_storage_format(task) != "delta":
+        return
+    if "zorder_by" not in output and "target_file_size" not in output:
+        return
+    if table_name is not None:
+        table_ref = table_name
+    else:
+        table_ref = f"delta.`{path}`"
+    if "target_file_size" in output:
+        # honored by OPTIMIZE and auto compaction on Databricks
+        spark.sql(f"ALTER TABLE {table_ref} SET TBLPROPERTIES ('delta.targetFileSize' = '{output['target_file_size']}')")
+    if "zorder_by" in output:
+        print(f"optimize {table_ref} zorder by {output['zorder_by']}")
+        if table_name is not None:
+            delta_table = DeltaTable.forName(spark, table_name)
+        else:
+            delta_table = DeltaTable.forPath(spark, path)
+        delta_table.optimize().executeZOrderBy(*output["zorder_by"])
+
+
+def target_exists(spark, table_name=None, path=None):
+    if table_name is not None:
+        return spark.catalog.tableExists(table_name)
+    return DeltaTable.isDeltaTable(spark, path)
+
+
+def merge_dataframe(df, task, table_name=None, path=None):
+    """Upserts the dataframe into the delta table or path of the task output
+
+    The `merge` block of the output sets the merge `keys`, an optional
+    `update_condition`, `delete_condition` and `insert_condition`, and an
+    optional `soft_delete` with the `column` flagged and its required
+    `condition`.
+    The target is created from the dataframe on the first run. The soft
+    delete column is added to the rows which don't have it, as false.
+    """
+    spark = df.sparkSession
+    if get_storage_format(task) != "delta":
+        raise Exception("Output mode merge requires the delta format")
+    merge_conf = task["output"].get("merge", {})
+    if "keys" not in merge_conf or len(merge_conf["keys"]) == 0:
+        raise Exception("Output mode merge requires merge keys")
+
+    soft_delete = merge_conf.get("soft_delete")
+    if soft_delete is not None and not soft_delete.get("condition"):
+        # without a condition every matched row would be flagged, and none updated
+        raise Exception("The soft delete of output mode merge requires a condition")
+    if soft_delete is not None and soft_delete["column"] not in df.columns:
+        df = df.withColumn(soft_delete["column"], lit(False))
+
+    if not target_exists(spark, table_name, path):
+        if table_name is not None:
+            configure_writer(df.write, task).mode("overwrite").saveAsTable(table_name)
+        else:
+            configure_writer(df.write, task).mode("overwrite").save(path)
+        return
+
+    if table_name is not None:
+        delta_table = DeltaTable.forName(spark, table_name)
+    else:
+        delta_table = DeltaTable.forPath(spark, path)
+    if soft_delete is not None and soft_delete["column"] not in delta_table.toDF().columns:
+        raise Exception(f"The merge target has no soft delete column {soft_delete['column']}")
+    condition = " AND ".join(f"t.`{key}` = s.`{key}`" for key in merge_conf["keys"])
+    builder = delta_table.alias("t").merge(df.alias("s"), condition)
+    if "delete_condition" in merge_conf:
+        builder = builder.whenMatchedDelete(condition=merge_conf["delete_condition"])
+    if soft_delete is not None:
+        builder = builder.whenMatchedUpdate(
+            condition=soft_delete["condition"],
+            set={f"`{soft_delete['column']}`": "true"})
+    builder = builder.whenMatchedUpdateAll(condition=merge_conf.get("update_condition"))
+    builder = builder.whenNotMatchedInsertAll(condition=merge_conf.get("insert_condition"))
+    builder.execute()
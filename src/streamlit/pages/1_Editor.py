@@ -2,6 +2,7 @@ import os
 import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
 import cddp
+import cddp.preview_cache as preview_cache
 import cddp.dbxapi as dbxapi
 import streamlit as st
 import pandas as pd
@@ -155,28 +156,12 @@ def run_task(task_name, stage="standard"):
     try:
         spark = st.session_state["spark"]
         config = current_pipeline_obj
-        with tempfile.TemporaryDirectory() as tmpdir:
-            working_dir = tmpdir+"/"+config['name']
-            cddp.init(spark, config, working_dir)
-            cddp.clean_database(spark, config)
-            cddp.init_database(spark, config)
-        try:
-            cddp.init_staging_sample_dataframe(spark, config)
-        except Exception as e:
-            print(e)
-        if stage in config:
-            for task in config[stage]:
-                
-                if task_name == task['name']: 
-                    print(f"start {stage} task: "+task_name)
-                    res_df = None
-                    if stage == "standard":
-                        res_df = cddp.start_standard_job(spark, config, task, False, True)
-                    elif stage == "serving":
-                        res_df = cddp.start_serving_job(spark, config, task, False, True)
-                    dataframe = res_df.toPandas()
-                    print(dataframe)
-                    st.session_state[f'_{task_name}_data'] = dataframe
+        print(f"start {stage} task: "+task_name)
+        # unchanged tasks return their last result without running again
+        preview = preview_cache.run_preview(spark, config, stage, task_name)
+        if preview is not None:
+            dataframe, schema = preview
+            st.session_state[f'_{task_name}_data'] = dataframe
 
     except Exception as e:
         st.error(f"Cannot run task: {e}")
@@ -1,4 +1,5 @@
 import cddp
+import cddp.preview_cache as preview_cache
 import json
 import random
 import streamlit as st
@@ -196,31 +197,13 @@ def run_task(task_name, stage="standard", index=None):
     try:
         spark = st.session_state["spark"]
         config = st.session_state["current_pipeline_obj"]
-        with tempfile.TemporaryDirectory() as tmpdir:
-            working_dir = tmpdir+"/"+config['name']
-            cddp.init(spark, config, working_dir)
-            cddp.clean_database(spark, config)
-            cddp.init_database(spark, config)
-        try:
-            cddp.init_staging_sample_dataframe(spark, config)
-        except Exception as e:
-            print(e)
-        if stage in config:
-            for task in config[stage]:
-                
-                if task_name == task['name']: 
-                    print(f"start {stage} task: "+task_name)
-                    res_df = None
-                    if stage == "standard":
-                        res_df = cddp.start_standard_job(spark, config, task, False, True)
-                    elif stage == "serving":
-                        res_df = cddp.start_serving_job(spark, config, task, False, True)
-                    dataframe = res_df.toPandas()
-                    # print(dataframe)
-                    current_editing_pipeline_tasks[stage][index]['sql_query_results'] = dataframe
-
-                    res_schema = res_df.schema.json()
-                    current_editing_pipeline_tasks[stage][index]['query_results_schema'] = json.loads(res_schema)
+        print(f"start {stage} task: "+task_name)
+        # unchanged tasks return their last result without running again
+        preview = preview_cache.run_preview(spark, config, stage, task_name)
+        if preview is not None:
+            dataframe, schema = preview
+            current_editing_pipeline_tasks[stage][index]['sql_query_results'] = dataframe
+            current_editing_pipeline_tasks[stage][index]['query_results_schema'] = json.loads(schema.json())
 
     except Exception as e:
         st.error(f"Cannot run task: {e}")
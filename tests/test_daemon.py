@@ -0,0 +1,53 @@
+import cddp
+import cddp.daemon as daemon
+import os
+import threading
+import time
+import pytest
+
+@pytest.fixture(scope="session")
+def create_spark():
+    if 'spark' not in globals():
+        globals()['spark'] = cddp.create_spark_session()
+    return globals()['spark']
+
+def test_daemon_runs_submitted_pipelines(create_spark, tmp_path):
+    state_path = str(tmp_path / "daemon.json")
+    server = threading.Thread(target=daemon.serve, args=(0, state_path))
+    server.start()
+    try:
+        while not os.path.exists(state_path):
+            time.sleep(0.1)
+        assert daemon.send_request({"command": "ping"}, state_path)["status"] == "ok"
+
+        response = daemon.submit({
+            "config_path": "./example/pipeline_fruit_batch.json",
+            "working_dir": "./tmp",
+            "stage_arg": None,
+            "task_arg": None,
+            "show_result": False,
+            "build_landing_zone": False,
+            "awaitTermination": None,
+            "cleanup_database": False,
+            "dry_run": True
+        }, state_path)
+        assert "fruit_sales_total_curation" in response["output"]
+
+        bad_token = daemon.read_state(state_path)
+        bad_token["token"] = "wrong"
+        daemon.write_state(str(tmp_path / "bad.json"), bad_token)
+        assert daemon.send_request({"command": "ping"}, str(tmp_path / "bad.json"))["status"] == "error"
+    finally:
+        daemon.send_request({"command": "shutdown"}, state_path)
+        server.join()
+    assert not os.path.exists(state_path)
+
+def test_warehouse_dir_does_not_follow_the_current_dir(create_spark, tmp_path):
+    warehouse_dir = cddp.get_local_warehouse_dir(spark)
+    assert os.path.isabs(warehouse_dir)
+    cwd = os.getcwd()
+    os.chdir(tmp_path)
+    try:
+        assert cddp.get_local_warehouse_dir(spark) == warehouse_dir
+    finally:
+        os.chdir(cwd)
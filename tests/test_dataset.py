@@ -0,0 +1,30 @@
+import cddp
+import cddp.dataset as dataset
+import pytest
+
+@pytest.fixture(scope="session")
+def create_spark():
+    if 'spark' not in globals():
+        globals()['spark'] = cddp.create_spark_session()
+    return globals()['spark']
+
+def test_dataset_pages(create_spark):
+    cddp.run_pipeline(create_spark, './example/pipeline_fruit_batch.json', './tmp', None, None, False, True, 0, True)
+    config = cddp.load_config('./example/pipeline_fruit_batch.json')
+    config['working_dir'] = './tmp'
+    task = config["serving"][0]
+
+    first = dataset.get_page(create_spark, config, "serving", task, limit=4, columns=["fruit"], order_by=["id"])
+    assert len(first["data"]) == 4
+    assert list(first["data"][0].keys()) == ["fruit"]
+    assert first["next_cursor"] is not None
+    assert first["row_count_estimate"] == 7
+
+    second = dataset.get_page(create_spark, config, "serving", task, limit=4, columns=["fruit"], order_by=["id"], cursor=first["next_cursor"])
+    assert len(second["data"]) == 3
+    assert second["next_cursor"] is None
+    offset_page, df = cddp.get_dataset_as_json(create_spark, config, "serving", task, limit=4, offset=4, columns=["fruit"], order_by=["id"])
+    assert offset_page == second["data"]
+
+    filtered, df = cddp.get_dataset_as_json(create_spark, config, "serving", task, filters=[{"column": "fruit", "op": "like", "value": "%Apple"}])
+    assert sorted(row["fruit"] for row in filtered) == ["Fiji Apple", "Green Apple"]
@@ -0,0 +1,28 @@
+import cddp
+import pytest
+
+dbxapi = pytest.importorskip("cddp.dbxapi")
+
+def get_dependencies(tasks):
+    return dict((task["task_key"], set(dep["task_key"] for dep in task["depends_on"])) for task in tasks)
+
+def test_workflow_tasks_follow_the_task_graph():
+    config = cddp.load_config('./example/pipeline_fruit_batch.json')
+    tasks = dbxapi.build_tasks(config, "/working_dir", "/config.json", "cluster")
+    assert get_dependencies(tasks) == {
+        "sales_ingestion": set(),
+        "price_ingestion": set(),
+        "fruit_sales_transform": {"sales_ingestion", "price_ingestion"},
+        "price_transform": {"price_ingestion"},
+        "fruit_sales_total_curation": {"fruit_sales_transform"}}
+
+def test_workflow_tasks_look_through_views_and_skip_streaming():
+    config = cddp.load_config('./example/pipeline_fruit_batch.json')
+    # the view-only standard task is recomputed by the serving task
+    config["standard"][0]["output"]["type"] = ["view"]
+    config["staging"][1]["input"]["read-type"] = "streaming"
+    tasks = dbxapi.build_tasks(config, "/working_dir", "/config.json", "cluster")
+    dependencies = get_dependencies(tasks)
+    assert "fruit_sales_transform" not in dependencies
+    assert dependencies["fruit_sales_total_curation"] == {"sales_ingestion"}
+    assert dependencies["price_transform"] == set()
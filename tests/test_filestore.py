@@ -0,0 +1,98 @@
+import cddp
+import os
+import cddp.ingestion.filestore as filestore
+import cddp.state as state_store
+import pytest
+
+@pytest.fixture(scope="session")
+def create_spark():
+    if 'spark' not in globals():
+        globals()['spark'] = cddp.create_spark_session()
+    return globals()['spark']
+
+def write_partitions(base_path):
+    for year in [2022, 2023]:
+        for month in [1, 2]:
+            folder = base_path / f"year={year}" / f"month={month}"
+            folder.mkdir(parents=True)
+            (folder / "data.csv").write_text(f"id,value\n{year}{month},{month}\n")
+
+def get_task(path, **input_conf):
+    task_input = {"type": "filestore", "format": "csv", "path": path, "read-type": "batch"}
+    task_input.update(input_conf)
+    return {
+        "name": "partitioned",
+        "input": task_input,
+        "schema": {"type": "struct", "fields": [
+            {"name": "id", "type": "integer", "nullable": True, "metadata": {}},
+            {"name": "value", "type": "integer", "nullable": True, "metadata": {}}]}
+    }
+
+def test_get_base_path():
+    assert filestore.get_base_path("/landing/sales/year=*/month=1") == "/landing/sales"
+    assert filestore.get_base_path("/landing/sales") == "/landing/sales"
+
+def test_partition_filter_prunes_folders(create_spark, tmp_path):
+    write_partitions(tmp_path / "sales")
+    task = get_task(str(tmp_path / "sales"), partition_filter={"year": 2023, "month": [2]})
+    files = filestore.list_landing_files(create_spark, task)
+    assert len(files) == 1 and "year=2023/month=2" in files[0]["path"]
+    df, is_streaming = filestore.start_ingestion_task(task, create_spark)
+    rows = df.collect()
+    assert [(row["id"], row["year"], row["month"]) for row in rows] == [(20232, 2023, 2)]
+
+def test_glob_path(create_spark, tmp_path):
+    write_partitions(tmp_path / "sales")
+    task = get_task(str(tmp_path / "sales") + "/year=2022/*")
+    df, is_streaming = filestore.start_ingestion_task(task, create_spark)
+    assert sorted(row["id"] for row in df.collect()) == [20221, 20222]
+    assert "month" in df.columns and "year" in df.columns
+
+def test_listing_cache(create_spark, tmp_path):
+    write_partitions(tmp_path / "sales")
+    config = {"working_dir": str(tmp_path / "work")}
+    task = get_task(str(tmp_path / "sales"), listing_cache=True)
+    assert len(filestore.list_landing_files(create_spark, task, config)) == 4
+    cache_path = state_store.get_listing_cache_path(config, task["input"]["path"])
+    assert len(state_store.load_json(cache_path)) > 0
+    # a new folder changes the modification time of its parent and is listed
+    folder = tmp_path / "sales" / "year=2024" / "month=1"
+    folder.mkdir(parents=True)
+    (folder / "data.csv").write_text("id,value\n20241,1\n")
+    assert len(filestore.list_landing_files(create_spark, task, config)) == 5
+
+def test_listing_cache_finds_files_in_nested_partitions(create_spark, tmp_path):
+    write_partitions(tmp_path / "sales")
+    config = {"working_dir": str(tmp_path / "work")}
+    task = get_task(str(tmp_path / "sales"), listing_cache=True)
+    assert len(filestore.list_landing_files(create_spark, task, config)) == 4
+    # new files only change the modification time of their own folder, not of year=2023 or the root
+    folder = tmp_path / "sales" / "year=2023" / "month=2"
+    (folder / "data_2.csv").write_text("id,value\n202322,2\n")
+    (folder / "data_3.csv").write_text("id,value\n202323,2\n")
+    os.utime(folder, (os.path.getmtime(folder) + 10, os.path.getmtime(folder) + 10))
+    cached_files = filestore.list_landing_files(create_spark, task, config)
+    assert [f["path"] for f in cached_files] == [f["path"] for f in filestore.list_landing_files(create_spark, task)]
+    assert len(cached_files) == 6
+
+def test_data_folders_are_read_with_a_cached_listing(create_spark, tmp_path):
+    write_partitions(tmp_path / "sales")
+    config = {"working_dir": str(tmp_path / "work")}
+    task = get_task(str(tmp_path / "sales"), listing_cache=True, partition_filter={"year": 2023})
+    folders = filestore.list_landing_folders(create_spark, task, config)
+    assert [folder.split("/sales/")[1] for folder in folders] == ["year=2023/month=1", "year=2023/month=2"]
+    # a new file of a data folder is listed by spark when reading the folder
+    (tmp_path / "sales" / "year=2023" / "month=2" / "data_2.csv").write_text("id,value\n202322,2\n")
+    df, is_streaming = filestore.start_ingestion_task(task, create_spark, config)
+    assert sorted(row["id"] for row in df.collect()) == [20231, 20232, 202322]
+
+def test_numeric_partition_filter_matches_padded_folders(create_spark, tmp_path):
+    folder = tmp_path / "sales" / "month=01"
+    folder.mkdir(parents=True)
+    (folder / "data.csv").write_text("id,value\n1,1\n")
+    (tmp_path / "sales" / "month=02").mkdir()
+    (tmp_path / "sales" / "month=02" / "data.csv").write_text("id,value\n2,2\n")
+    task = get_task(str(tmp_path / "sales"), partition_filter={"month": 1})
+    df, is_streaming = filestore.start_ingestion_task(task, create_spark)
+    assert [row["id"] for row in df.collect()] == [1]
+    assert filestore.is_partition_value("2023", ["2023"]) and not filestore.is_partition_value("01", ["1"])
@@ -0,0 +1,75 @@
+import cddp
+import json
+import pytest
+
+@pytest.fixture(scope="session")
+def create_spark():
+    if 'spark' not in globals():
+        globals()['spark'] = cddp.create_spark_session()
+    return globals()['spark']
+
+def test_example_pipeline_fruit_batch_incremental(create_spark, tmp_path):
+    config = cddp.load_config('./example/pipeline_fruit_batch.json')
+    for task in config["staging"]:
+        task["input"]["incremental"] = {"mode": "files"}
+    config_path = str(tmp_path / "pipeline.json")
+    with open(config_path, "w") as f:
+        json.dump(config, f)
+
+    cddp.run_pipeline(create_spark, config_path, './tmp', None, None, False, True, 0, True)
+    # the second run finds no new landed files and must not append them again
+    cddp.run_pipeline(create_spark, config_path, './tmp', None, None, False, False, 0, False)
+
+    stg_sales = create_spark.read.format("delta").load(f"./tmp/{config['name']}/stg/data/stg_sales")
+    assert stg_sales.count() == 7
+
+def test_empty_increment_without_schema_is_not_written(create_spark, tmp_path):
+    (tmp_path / "landing").mkdir()
+    (tmp_path / "landing" / "sales_1.csv").write_text("id,amount\n1,10\n")
+    config = {
+        "name": "incremental_no_schema_app",
+        "staging": [{
+            "name": "sales_ingestion",
+            "input": {"type": "filestore", "format": "csv", "path": str(tmp_path / "landing"), "read-type": "batch",
+                      "incremental": {"mode": "files"}},
+            "output": {"target": "stg_sales_no_schema", "type": ["file"]}
+        }]
+    }
+    cddp.init(None, config, str(tmp_path / "work"))
+    task = config["staging"][0]
+    cddp.start_staging_job(create_spark, config, task)
+    # the second run finds no new files, and has no schema to read them with
+    df = cddp.start_staging_job(create_spark, config, task)
+    assert df.columns == []
+    stg_sales = create_spark.read.format("delta").load(f"{config['staging_path']}/data/stg_sales_no_schema")
+    assert stg_sales.count() == 1
+
+def test_watermark_mode_reads_new_files_only(create_spark, tmp_path):
+    (tmp_path / "landing").mkdir()
+    (tmp_path / "landing" / "sales_1.csv").write_text("id,ts\n1,10\n2,20\n")
+    config = {
+        "name": "incremental_watermark_app",
+        "staging": [{
+            "name": "sales_ingestion",
+            "input": {"type": "filestore", "format": "csv", "path": str(tmp_path / "landing"), "read-type": "batch",
+                      "incremental": {"mode": "watermark", "column": "ts"}},
+            "output": {"target": "stg_sales_watermark", "type": ["view"]},
+            "schema": {"type": "struct", "fields": [
+                {"name": "id", "type": "integer", "nullable": True, "metadata": {}},
+                {"name": "ts", "type": "integer", "nullable": True, "metadata": {}}]}
+        }]
+    }
+    cddp.init(None, config, str(tmp_path / "work"))
+    task = config["staging"][0]
+    df, is_streaming, pending_state = cddp.incremental.start_ingestion_task(create_spark, config, task)
+    assert df.count() == 2 and pending_state["watermark"] == 20
+    cddp.incremental.commit_increment(config, task, pending_state)
+
+    # a late row of a new file is filtered by the watermark
+    (tmp_path / "landing" / "sales_2.csv").write_text("id,ts\n3,30\n4,15\n")
+    df, is_streaming, pending_state = cddp.incremental.start_ingestion_task(create_spark, config, task)
+    assert [row["id"] for row in df.collect()] == [3]
+    assert pending_state["last_batch"] == [f["path"] for f in cddp.ingestion.filestore.list_landing_files(
+        create_spark, task, config) if f["path"].endswith("sales_2.csv")]
+    cddp.incremental.commit_increment(config, task, pending_state)
+    assert [row["id"] for row in cddp.incremental.load_last_increment(create_spark, config, task).collect()] == [3]
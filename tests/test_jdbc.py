@@ -0,0 +1,52 @@
+import cddp
+import cddp.ingestion.jdbc as jdbc
+import sqlite3
+import pytest
+
+@pytest.fixture(scope="session")
+def create_spark():
+    if 'spark' not in globals():
+        globals()['spark'] = cddp.create_spark_session()
+    return globals()['spark']
+
+@pytest.fixture()
+def sqlite_url(create_spark, tmp_path):
+    # the sqlite JDBC driver is added with spark.jars, e.g. org.xerial:sqlite-jdbc
+    jvm = create_spark._jvm
+    try:
+        jvm.java.lang.Class.forName("org.sqlite.JDBC", True, jvm.java.lang.Thread.currentThread().getContextClassLoader())
+    except Exception:
+        pytest.skip("the sqlite JDBC driver isn't on the Spark classpath")
+    db_path = str(tmp_path / "source.db")
+    with sqlite3.connect(db_path) as connection:
+        connection.execute("CREATE TABLE sales (id INTEGER, fruit TEXT, amount INTEGER)")
+        connection.executemany("INSERT INTO sales VALUES (?, ?, ?)",
+                               [(i, "Apple" if i % 2 else "Peach", i * 10) for i in range(1, 101)])
+    return "jdbc:sqlite:" + db_path
+
+def get_task(url, **input_conf):
+    task_input = {"type": "jdbc", "jdbc_url": url, "driver": "org.sqlite.JDBC", "table_name": "sales"}
+    task_input.update(input_conf)
+    return {"name": "sales", "input": task_input}
+
+def test_partitioned_read(create_spark, sqlite_url):
+    df, is_streaming = jdbc.start_ingestion_task(get_task(sqlite_url, partition_column="id", num_partitions=4), create_spark)
+    assert not is_streaming
+    assert df.rdd.getNumPartitions() == 4
+    assert df.count() == 100
+
+def test_predicates(create_spark, sqlite_url):
+    task = get_task(sqlite_url, predicates=["fruit = 'Apple'", "fruit = 'Peach' AND amount > 500"])
+    df, is_streaming = jdbc.start_ingestion_task(task, create_spark)
+    assert df.rdd.getNumPartitions() == 2
+    assert df.count() == 50 + 25
+
+def test_query_with_watermark(create_spark, sqlite_url):
+    task = get_task(sqlite_url, query="SELECT id, amount FROM sales WHERE fruit = 'Apple'", partition_column="id")
+    df, is_streaming = jdbc.start_ingestion_task(task, create_spark, watermark=("id", 50, 60))
+    assert sorted(row["id"] for row in df.collect()) == [51, 53, 55, 57, 59]
+
+def test_watermark_condition():
+    assert jdbc.get_watermark_condition("ts", "2023-01-01", None) == "ts > '2023-01-01'"
+    assert jdbc.get_watermark_condition("id", 1, 2) == "id > 1 AND id <= 2"
+    assert jdbc.get_source_table({"table_name": "sales"}) == "sales"
@@ -0,0 +1,87 @@
+import cddp
+import os
+import cddp.incremental as incremental
+import cddp.ingestion.filestore as filestore
+import cddp.landing as landing
+import cddp.state as state_store
+import pytest
+
+@pytest.fixture(scope="session")
+def create_spark():
+    if 'spark' not in globals():
+        globals()['spark'] = cddp.create_spark_session()
+    return globals()['spark']
+
+def get_config(tmp_path, compact):
+    config = {
+        "name": "landing_app",
+        "staging": [{
+            "name": "sales_ingestion",
+            "input": {"type": "filestore", "format": "csv", "path": str(tmp_path / "landing"), "read-type": "batch",
+                      "compact": compact},
+            "output": {"target": "stg_sales", "type": ["view"]},
+            "schema": {"type": "struct", "fields": [
+                {"name": "id", "type": "integer", "nullable": True, "metadata": {}},
+                {"name": "amount", "type": "integer", "nullable": True, "metadata": {}}]}
+        }]
+    }
+    cddp.init(None, config, str(tmp_path / "work"))
+    return config
+
+@pytest.mark.parametrize("format", ["parquet", "delta"])
+def test_landed_files_are_converted_once(create_spark, tmp_path, format):
+    config = get_config(tmp_path, {"format": format})
+    task = config["staging"][0]
+    (tmp_path / "landing").mkdir()
+    (tmp_path / "landing" / "sales_1.csv").write_text("id,amount\n1,10\n2,20\n")
+    df, is_streaming = landing.start_ingestion_task(task, create_spark, config)
+    assert df.count() == 2
+
+    (tmp_path / "landing" / "sales_2.csv").write_text("id,amount\n3,30\n")
+    assert landing.compact_landing(create_spark, config, task) == 1
+    assert landing.compact_landing(create_spark, config, task) == 0
+    df, is_streaming = landing.start_ingestion_task(task, create_spark, config)
+    assert sorted(row["id"] for row in df.collect()) == [1, 2, 3]
+    state = state_store.load_json(state_store.get_landing_state_path(config, task))
+    assert len(state["files"]) == 2 and "pending" not in state
+
+def test_only_text_formats_are_compacted(tmp_path):
+    config = get_config(tmp_path, True)
+    config["staging"][0]["input"]["format"] = "parquet"
+    with pytest.raises(Exception, match="Compact landing only converts"):
+        landing.get_compact_conf(config["staging"][0])
+
+@pytest.mark.parametrize("format", ["parquet", "delta"])
+def test_retried_batch_is_not_duplicated(create_spark, tmp_path, format):
+    config = get_config(tmp_path, {"format": format})
+    task = config["staging"][0]
+    (tmp_path / "landing").mkdir()
+    (tmp_path / "landing" / "sales_1.csv").write_text("id,amount\n1,10\n2,20\n")
+    files = filestore.list_landing_files(create_spark, task, config)
+    batch = {"batch_id": 0, "files": [f["path"] for f in files], "files_info": files}
+    # the run failed after writing the batch, before saving the state
+    landing.write_batch(create_spark, config, task, batch)
+    state = state_store.load_json(state_store.get_landing_state_path(config, task))
+    state_store.save_json(state_store.get_landing_state_path(config, task), dict(state, pending=batch))
+    df, is_streaming = landing.start_ingestion_task(task, create_spark, config)
+    assert sorted(row["id"] for row in df.collect()) == [1, 2]
+    assert df.columns == ["id", "amount"]
+
+def test_incremental_files_mode_rejects_compact_landing(tmp_path):
+    config = get_config(tmp_path, True)
+    config["staging"][0]["input"]["incremental"] = {"mode": "files"}
+    with pytest.raises(Exception, match="compact landing copy"):
+        incremental.get_incremental_conf(config["staging"][0])
+
+@pytest.mark.parametrize("format", ["parquet", "delta"])
+def test_copy_is_converted_again_after_a_state_reset(create_spark, tmp_path, format):
+    config = get_config(tmp_path, {"format": format, "path": str(tmp_path / "copy")})
+    task = config["staging"][0]
+    (tmp_path / "landing").mkdir()
+    (tmp_path / "landing" / "sales_1.csv").write_text("id,amount\n1,10\n2,20\n")
+    assert landing.compact_landing(create_spark, config, task) == 1
+    # a cleanup removes the state but not the copy of a custom path
+    os.remove(state_store.get_landing_state_path(config, task))
+    (tmp_path / "landing" / "sales_2.csv").write_text("id,amount\n3,30\n")
+    df, is_streaming = landing.start_ingestion_task(task, create_spark, config)
+    assert sorted(row["id"] for row in df.collect()) == [1, 2, 3]
@@ -0,0 +1,90 @@
+import cddp
+import json
+import pytest
+
+@pytest.fixture(scope="session")
+def create_spark():
+    if 'spark' not in globals():
+        globals()['spark'] = cddp.create_spark_session()
+    return globals()['spark']
+
+def test_example_pipeline_fruit_batch_merge(create_spark, tmp_path):
+    config = cddp.load_config('./example/pipeline_fruit_batch.json')
+    serving_task = config["serving"][0]
+    serving_task["output"]["mode"] = "merge"
+    serving_task["output"]["merge"] = {"keys": ["id"]}
+    config_path = str(tmp_path / "pipeline.json")
+    with open(config_path, "w") as f:
+        json.dump(config, f)
+
+    # the first run creates the serving table, the second one merges into it
+    cddp.run_pipeline(create_spark, config_path, './tmp', None, None, False, True, 0, True)
+    serving_df = cddp.run_pipeline(create_spark, config_path, './tmp', None, None, True, False, 0, False)
+
+    list = serving_df[0].toPandas().sort_values(by='id', ascending=True).to_records(index=False).tolist()
+    assert [(1, 'Red Grape', 24.0),\
+            (2, 'Peach', 39.0),\
+            (3, 'Orange', 28.0),\
+            (4, 'Green Apple', 45.0),\
+            (5, 'Fiji Apple', 56.0),\
+            (6, 'Banana', 17.0),\
+            (7, 'Green Grape', 36.0)] == list
+
+def get_merge_task():
+    return {"name": "merge_test", "output": {"target": "merge_test", "type": ["file"], "mode": "merge", "merge": {
+        "keys": ["id"],
+        "delete_condition": "s.op = 'D'",
+        "soft_delete": {"column": "is_deleted", "condition": "s.op = 'X'"}}}}
+
+def test_merge_updates_and_deletes_changed_keys(create_spark, tmp_path):
+    path = str(tmp_path / "merge_test")
+    task = get_merge_task()
+    schema = "id int, value string, op string"
+    cddp.writer.merge_dataframe(create_spark.createDataFrame(
+        [(1, "a", "U"), (2, "b", "U"), (3, "c", "U"), (4, "d", "U")], schema), task, path=path)
+    cddp.writer.merge_dataframe(create_spark.createDataFrame(
+        [(1, "a2", "U"), (2, None, "D"), (3, None, "X"), (5, "e", "U")], schema), task, path=path)
+
+    rows = create_spark.read.format("delta").load(path).select("id", "value", "is_deleted").orderBy("id").collect()
+    # an overwrite would lose id 4 and keep id 2, an append would duplicate id 1
+    assert [tuple(row) for row in rows] == [(1, "a2", False), (3, "c", True), (4, "d", False), (5, "e", False)]
+
+def test_streaming_merge(create_spark, tmp_path):
+    path = str(tmp_path / "merge_test")
+    task = get_merge_task()
+    landing_path = tmp_path / "landing"
+    landing_path.mkdir()
+    (landing_path / "batch_0.json").write_text('{"id": 1, "value": "a", "op": "U"}\n{"id": 2, "value": "b", "op": "U"}\n')
+
+    def run_stream():
+        df = create_spark.readStream.schema("id int, value string, op string").json(str(landing_path))
+        # outside a managed run, the query is awaited until its availableNow trigger ends
+        cddp.output_dataset(create_spark, task, df, True, str(tmp_path), "merge", timeout=120)
+
+    task["output"]["trigger"] = {"availableNow": True}
+    run_stream()
+    (landing_path / "batch_1.json").write_text('{"id": 1, "value": "a2", "op": "U"}\n{"id": 2, "value": null, "op": "D"}\n')
+    run_stream()
+    rows = create_spark.read.format("delta").load(str(tmp_path / "data" / "merge_test")).select("id", "value").collect()
+    assert [tuple(row) for row in rows] == [(1, "a2")]
+
+def test_soft_delete_flags_matched_rows(create_spark, tmp_path):
+    path = str(tmp_path / "merge_test")
+    task = get_merge_task()
+    del task["output"]["merge"]["delete_condition"]
+    schema = "id int, value string, op string"
+    cddp.writer.merge_dataframe(create_spark.createDataFrame(
+        [(1, "a", "U"), (2, "b", "U"), (3, "c", "U")], schema), task, path=path)
+    cddp.writer.merge_dataframe(create_spark.createDataFrame(
+        [(1, "a2", "U"), (2, "b2", "X"), (4, "d", "U")], schema), task, path=path)
+
+    rows = create_spark.read.format("delta").load(path).select("id", "value", "is_deleted").orderBy("id").collect()
+    # a flagged row keeps its values, the other matched rows are updated
+    assert [tuple(row) for row in rows] == [(1, "a2", False), (2, "b", True), (3, "c", False), (4, "d", False)]
+
+def test_soft_delete_requires_a_condition(create_spark, tmp_path):
+    task = get_merge_task()
+    del task["output"]["merge"]["soft_delete"]["condition"]
+    df = create_spark.createDataFrame([(1, "a", "U")], "id int, value string, op string")
+    with pytest.raises(Exception, match="requires a condition"):
+        cddp.writer.merge_dataframe(df, task, path=str(tmp_path / "merge_test"))
@@ -0,0 +1,33 @@
+import cddp
+import json
+import pytest
+
+@pytest.fixture(scope="session")
+def create_spark():
+    if 'spark' not in globals():
+        globals()['spark'] = cddp.create_spark_session()
+    return globals()['spark']
+
+def test_example_pipeline_fruit_batch_metrics(create_spark, tmp_path):
+    config = cddp.load_config('./example/pipeline_fruit_batch.json')
+    metrics_path = str(tmp_path / "metrics.jsonl")
+    config["metrics"] = {"sink": "jsonl", "path": metrics_path}
+    config_path = str(tmp_path / "pipeline.json")
+    with open(config_path, "w") as f:
+        json.dump(config, f)
+
+    cddp.run_pipeline(create_spark, config_path, './tmp', None, None, False, True, 0, True)
+
+    with open(metrics_path) as f:
+        records = [json.loads(line) for line in f]
+    tasks = dict(((record["stage"], record["task"]), record) for record in records)
+    assert set(tasks.keys()) == {
+        ("staging", "sales_ingestion"),
+        ("staging", "price_ingestion"),
+        ("standard", "fruit_sales_transform"),
+        ("standard", "price_transform"),
+        ("serving", "fruit_sales_total_curation")}
+    for record in records:
+        assert record["status"] == "succeeded"
+        assert record["wall_time"] >= 0
+    assert len(tasks[("staging", "sales_ingestion")]["job_ids"]) > 0
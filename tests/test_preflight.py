@@ -0,0 +1,53 @@
+import cddp
+import cddp.preflight as preflight
+import pytest
+
+@pytest.fixture(scope="session")
+def create_spark():
+    if 'spark' not in globals():
+        globals()['spark'] = cddp.create_spark_session()
+    return globals()['spark']
+
+def test_preflight_resolves_output_schemas(create_spark):
+    config = cddp.load_config('./example/pipeline_fruit_batch.json')
+    results = preflight.run_preflight(create_spark, config)
+    schema = results[("serving", "fruit_sales_total_curation")]["schema"]
+    assert [field.name for field in schema.fields] == ["id", "fruit", "total"]
+
+def test_preflight_reports_unresolved_columns(create_spark):
+    config = cddp.load_config('./example/pipeline_fruit_batch.json')
+    config["standard"][1]["code"]["sql"] = ["select missing_column from stg_price"]
+    with pytest.raises(Exception, match="standard.price_transform"):
+        preflight.run_preflight(create_spark, config)
+
+def test_dry_run_returns_schemas_and_plans(create_spark):
+    results = cddp.run_pipeline(create_spark, './example/pipeline_fruit_batch.json', './tmp', None, None, False, False, None, False, dry_run=True)
+    assert set(results.keys()) == {
+        ("staging", "sales_ingestion"),
+        ("staging", "price_ingestion"),
+        ("standard", "fruit_sales_transform"),
+        ("standard", "price_transform"),
+        ("serving", "fruit_sales_total_curation")}
+    result = results[("standard", "fruit_sales_transform")]
+    assert [field.name for field in result["schema"].fields] == ["fruit", "id", "amount", "price", "ts"]
+    assert "Join" in result["plan"]
+
+def test_preflight_skips_staging_tasks_without_schema(create_spark):
+    config = cddp.load_config('./example/pipeline_fruit_batch.json')
+    del config["staging"][0]["schema"]
+    results = preflight.run_preflight(create_spark, config)
+    assert results[("staging", "sales_ingestion")]["schema"] is None
+    assert results[("standard", "fruit_sales_transform")]["schema"] is None
+    assert results[("serving", "fruit_sales_total_curation")]["schema"] is None
+    assert results[("standard", "price_transform")]["schema"] is not None
+
+def test_preflight_does_not_run_python_code(create_spark):
+    config = cddp.load_config('./example/pipeline_fruit_batch.json')
+    config["standard"][1]["code"] = {"lang": "python", "python": "raise Exception('python code must not run')"}
+    results = preflight.run_preflight(create_spark, config)
+    assert results[("standard", "price_transform")]["schema"] is None
+
+    config["standard"][1]["output"]["schema"] = {"type": "struct", "fields": [
+        {"name": "id", "type": "integer", "nullable": True, "metadata": {}}]}
+    results = preflight.run_preflight(create_spark, config)
+    assert results[("standard", "price_transform")]["schema"].fieldNames() == ["id"]
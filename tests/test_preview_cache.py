@@ -0,0 +1,40 @@
+import cddp
+import cddp.preview_cache as preview_cache
+import cddp.sandbox as sandbox
+import pytest
+
+@pytest.fixture(scope="session")
+def create_spark():
+    if 'spark' not in globals():
+        globals()['spark'] = cddp.create_spark_session()
+    return globals()['spark']
+
+def test_preview_cache_reuses_unchanged_results(create_spark, monkeypatch):
+    runs = []
+    run_task = sandbox.run_task
+    def track_run_task(*args, **kwargs):
+        runs.append(args[3])
+        return run_task(*args, **kwargs)
+    monkeypatch.setattr(sandbox, "run_task", track_run_task)
+    preview_cache.clear()
+
+    config = cddp.load_config('./example/pipeline_fruit_batch.json')
+    config["name"] = "fruit_batch_preview_app"
+    first, schema = preview_cache.run_preview(create_spark, config, "serving", "fruit_sales_total_curation")
+    second, schema = preview_cache.run_preview(create_spark, config, "serving", "fruit_sales_total_curation")
+    assert second is not first and second.equals(first)
+    # the returned frames are copies of the cached result
+    second.drop(second.index, inplace=True)
+    third, schema = preview_cache.run_preview(create_spark, config, "serving", "fruit_sales_total_curation")
+    assert third.equals(first)
+    assert runs == ["fruit_sales_total_curation"]
+    assert schema.fieldNames() == ["id", "fruit", "total"]
+
+    # a change of an upstream task invalidates the preview
+    config["standard"][0]["code"]["sql"] = ["select price.fruit, price.id, sales.amount, price.price, sales.ts from stg_sales sales join stg_price price on sales.id = price.id"]
+    changed, schema = preview_cache.run_preview(create_spark, config, "serving", "fruit_sales_total_curation")
+    assert len(runs) == 2
+
+def test_table_names_of_sql_tasks(create_spark):
+    task = {"name": "t", "code": {"lang": "sql", "sql": "select a.id from sales.orders a where exists (select 1 from `returns` r where r.id = a.id) order by a.id"}}
+    assert preview_cache.get_table_names(create_spark, task) == {"sales.orders", "returns"}
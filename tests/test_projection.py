@@ -0,0 +1,79 @@
+import cddp
+import cddp.projection as projection
+import pytest
+
+@pytest.fixture(scope="session")
+def create_spark():
+    if 'spark' not in globals():
+        globals()['spark'] = cddp.create_spark_session()
+    return globals()['spark']
+
+def get_config(landing_path, output_type=["view"]):
+    fields = ["id", "fruit", "price", "color", "origin"]
+    return {
+        "name": "projection_app",
+        "staging": [{
+            "name": "price_ingestion",
+            "input": {"type": "filestore", "format": "parquet", "path": landing_path, "read-type": "batch"},
+            "output": {"target": "stg_wide_price", "type": output_type},
+            "schema": {"type": "struct", "fields": [
+                {"name": name, "type": "integer" if name in ["id", "price"] else "string", "nullable": True, "metadata": {}}
+                for name in fields]}
+        }],
+        "standard": [{
+            "name": "price_transform",
+            "type": "batch",
+            "code": {"lang": "sql", "sql": ["select p.id, p.price from stg_wide_price p where p.price > 10"]},
+            "output": {"target": "std_wide_price", "type": ["view"]},
+            "dependency": []
+        }],
+        "serving": [{
+            "name": "price_total",
+            "type": "batch",
+            "code": {"lang": "sql", "sql": ["select sum(price) as total from std_wide_price"]},
+            "output": {"target": "srv_wide_price_total", "type": ["view"]},
+            "dependency": []
+        }]
+    }
+
+def test_downstream_columns_and_filters_are_pushed(create_spark, tmp_path):
+    landing_path = str(tmp_path / "landing")
+    create_spark.createDataFrame([(1, "Apple", 5, "red", "NZ"), (2, "Peach", 20, "orange", "CN")],
+                                 "id int, fruit string, price int, color string, origin string") \
+        .write.parquet(landing_path)
+    config = get_config(landing_path)
+    result = projection.get_projections(create_spark, config)["stg_wide_price"]
+    assert result["columns"] == ["id", "price"]
+    assert "price" in result["filter"]
+    # the view and alias qualifiers can't be resolved against the staging read
+    assert "p." not in result["filter"] and "stg_wide_price." not in result["filter"]
+
+    task = config["staging"][0]
+    df, is_streaming = cddp.cddp_ingestion.start_ingestion_task(task, create_spark)
+    df = projection.apply_projection(create_spark, config, task, df)
+    assert [tuple(row) for row in df.collect()] == [(2, 20)]
+
+def test_persisted_outputs_are_not_pruned_by_default(create_spark, tmp_path):
+    config = get_config(str(tmp_path / "landing"), ["file", "view"])
+    assert not projection.is_prunable(config["staging"][0])
+    config["staging"][0]["input"]["prune_columns"] = True
+    assert projection.is_prunable(config["staging"][0])
+
+def test_columns_read_by_subqueries_are_kept(create_spark, tmp_path):
+    landing_path = str(tmp_path / "landing")
+    create_spark.createDataFrame([(1, "Apple", 5, "red", "NZ"), (2, "Peach", 20, "orange", "CN")],
+                                 "id int, fruit string, price int, color string, origin string") \
+        .write.parquet(landing_path)
+    config = get_config(landing_path)
+    config["standard"][0]["code"]["sql"] = [
+        "select id, price from stg_wide_price where price > (select min(length(color)) from stg_wide_price)"]
+    result = projection.get_projections(create_spark, config)["stg_wide_price"]
+    assert result["columns"] == ["id", "price", "color"]
+    # the subquery reads every row
+    assert result["filter"] is None
+
+    task = config["staging"][0]
+    df, is_streaming = cddp.cddp_ingestion.start_ingestion_task(task, create_spark)
+    df = projection.apply_projection(create_spark, config, task, df)
+    df.createOrReplaceTempView("stg_wide_price")
+    assert [tuple(row) for row in create_spark.sql(config["standard"][0]["code"]["sql"][0]).collect()] == [(2, 20)]
@@ -0,0 +1,21 @@
+import cddp
+import os
+import pytest
+
+@pytest.fixture(scope="session")
+def create_spark():
+    if 'spark' not in globals():
+        globals()['spark'] = cddp.create_spark_session()
+    return globals()['spark']
+
+def test_in_memory_sample_data(create_spark, tmp_path):
+    config = cddp.load_config('./example/pipeline_fruit_batch.json')
+    cddp.init(create_spark, config, str(tmp_path))
+    cddp.init_staging_sample_dataframe(create_spark, config, in_memory=True)
+
+    task = config["staging"][1]
+    df = create_spark.table(task["output"]["target"])
+    assert create_spark.catalog.isCached(task["output"]["target"])
+    assert df.count() == len(task["sampleData"])
+    assert df.schema.fieldNames() == [field["name"] for field in task["schema"]["fields"]]
+    assert not os.path.exists(config["staging_path"])
@@ -0,0 +1,46 @@
+import cddp
+import cddp.sandbox as sandbox
+import pytest
+
+@pytest.fixture(scope="session")
+def create_spark():
+    if 'spark' not in globals():
+        globals()['spark'] = cddp.create_spark_session()
+    return globals()['spark']
+
+def test_sandbox_only_rebuilds_changed_tasks(create_spark, monkeypatch):
+    built = []
+    build_task = sandbox.build_task
+    def track_build_task(session, config, stage, task, timeout=None):
+        built.append((stage, task["name"]))
+        return build_task(session, config, stage, task, timeout)
+    monkeypatch.setattr(sandbox, "build_task", track_build_task)
+
+    config = cddp.load_config('./example/pipeline_fruit_batch.json')
+    session, task = sandbox.run_task(create_spark, config, "serving", "fruit_sales_total_curation")
+    assert set(built) == {
+        ("staging", "sales_ingestion"),
+        ("staging", "price_ingestion"),
+        ("standard", "fruit_sales_transform"),
+        ("serving", "fruit_sales_total_curation")}
+
+    built.clear()
+    sandbox.run_task(create_spark, config, "serving", "fruit_sales_total_curation")
+    assert built == []
+
+    built.clear()
+    config["serving"][0]["code"]["sql"] = ["select fruit, sum(amount*price) as total from std_fruit_sales group by fruit"]
+    session, task = sandbox.run_task(create_spark, config, "serving", "fruit_sales_total_curation")
+    assert built == [("serving", "fruit_sales_total_curation")]
+    result, df = cddp.get_dataset_as_json(session, config, "serving", task, 20)
+    assert len(result) == 7
+
+def test_replaced_view_is_unpersisted(create_spark):
+    task = {"name": "cached_view", "output": {"target": "cached_view", "type": ["view"], "cache": True}}
+    first = cddp.view_cache.register_view(create_spark, task, create_spark.range(3))
+    second = cddp.view_cache.register_view(create_spark, task, create_spark.range(4))
+    assert not first.is_cached
+    assert second.is_cached
+    assert [df for _, df in cddp.view_cache.persisted_dfs if df is first] == []
+    cddp.view_cache.release(create_spark)
+    assert not second.is_cached
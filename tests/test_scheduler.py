@@ -0,0 +1,45 @@
+import cddp
+import cddp.scheduler as scheduler
+import pytest
+
+@pytest.fixture(scope="session")
+def create_spark():
+    if 'spark' not in globals():
+        globals()['spark'] = cddp.create_spark_session()
+    return globals()['spark']
+
+def test_build_task_graph_fruit_batch():
+    config = cddp.load_config('./example/pipeline_fruit_batch.json')
+    graph = scheduler.build_task_graph(config)
+    assert list(graph.keys()) == [("staging", "sales_ingestion"),
+                                  ("staging", "price_ingestion"),
+                                  ("standard", "fruit_sales_transform"),
+                                  ("standard", "price_transform"),
+                                  ("serving", "fruit_sales_total_curation")]
+    assert graph[("staging", "sales_ingestion")]["depends_on"] == set()
+    assert graph[("standard", "fruit_sales_transform")]["depends_on"] == {("staging", "sales_ingestion"), ("staging", "price_ingestion")}
+    assert graph[("standard", "price_transform")]["depends_on"] == {("staging", "price_ingestion")}
+    assert graph[("serving", "fruit_sales_total_curation")]["depends_on"] == {("standard", "fruit_sales_transform")}
+
+def test_build_task_graph_cycle():
+    config = {
+        "standard": [
+            {"name": "a", "code": {"lang": "sql", "sql": "select * from b_out"}, "output": {"target": "a_out", "type": ["view"]}},
+            {"name": "b", "code": {"lang": "sql", "sql": "select * from a_out"}, "output": {"target": "b_out", "type": ["view"]}}
+        ]
+    }
+    with pytest.raises(Exception, match="Cyclic dependency"):
+        scheduler.build_task_graph(config)
+
+def test_example_pipeline_fruit_batch_parallel(create_spark):
+    serving_df = cddp.run_pipeline(create_spark, './example/pipeline_fruit_batch.json', './tmp', None, None, True, True, 0, True, 4)
+    assert len(serving_df)== 1
+    list = serving_df[0].toPandas().sort_values(by='id', ascending=True).to_records(index=False).tolist()
+    assert len(list)==7
+    assert [(1, 'Red Grape', 24.0),\
+            (2, 'Peach', 39.0),\
+            (3, 'Orange', 28.0),\
+            (4, 'Green Apple', 45.0),\
+            (5, 'Fiji Apple', 56.0),\
+            (6, 'Banana', 17.0),\
+            (7, 'Green Grape', 36.0)] == list
@@ -0,0 +1,48 @@
+import cddp
+import cddp.schema_resolver as schema_resolver
+import json
+import os
+import pytest
+
+@pytest.fixture(scope="session")
+def create_spark():
+    if 'spark' not in globals():
+        globals()['spark'] = cddp.create_spark_session()
+    return globals()['spark']
+
+def test_declared_schema_is_not_inferred(create_spark):
+    schema = {"type": "struct", "fields": [{"name": "id", "type": "integer", "nullable": True, "metadata": {}}]}
+    task = {"input": {"format": "csv", "path": "./does_not_exist"}, "schema": schema}
+    assert schema_resolver.resolve_schema(create_spark, task).jsonValue() == schema
+
+def test_infer_file_schema_is_cached_by_fingerprint(create_spark, tmp_path):
+    schema_resolver.clear()
+    path = tmp_path / "data.csv"
+    path.write_text("id,price\n1,2.5\n2,3.0\n")
+    schema = schema_resolver.infer_file_schema(create_spark, str(path), "csv")
+    assert [(field.name, field.dataType.typeName()) for field in schema.fields] == [("id", "integer"), ("price", "double")]
+    assert len(schema_resolver.inferred_schemas) == 1
+    schema_resolver.infer_file_schema(create_spark, str(path), "csv")
+    assert len(schema_resolver.inferred_schemas) == 1
+    # a changed file has another fingerprint
+    path.write_text("id,price,fruit\n1,2.5,Apple\n")
+    os.utime(path, (0, 0))
+    schema = schema_resolver.infer_file_schema(create_spark, str(path), "csv")
+    assert schema.fieldNames() == ["id", "price", "fruit"]
+    assert len(schema_resolver.inferred_schemas) == 2
+
+def test_infer_data_schema_samples_rows(create_spark):
+    rows = [{"id": i} for i in range(10)] + [{"id": "not a number"}]
+    schema = schema_resolver.infer_data_schema(create_spark, json.dumps(rows), "json", sample_rows=10)
+    assert schema["id"].dataType.typeName() == "long"
+
+def test_load_sample_data_csv(create_spark):
+    json_str, schema = cddp.load_sample_data(create_spark, 'id,fruit\n1,"Red\nGrape"\n2,Peach\n', format="csv")
+    assert json.loads(json_str) == [{"id": 1, "fruit": "Red\nGrape"}, {"id": 2, "fruit": "Peach"}]
+
+def test_source_folders_are_not_listed(create_spark, tmp_path):
+    folder = tmp_path / "landing" / "year=2023"
+    folder.mkdir(parents=True)
+    (folder / "data.csv").write_text("id\n1\n")
+    statuses = schema_resolver.get_source_status(create_spark, [str(tmp_path / "landing")])
+    assert [status[0].rstrip("/").endswith("/landing") for status in statuses] == [True]
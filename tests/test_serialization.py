@@ -0,0 +1,28 @@
+import cddp
+import cddp.serialization as serialization
+import pyarrow as pa
+import pytest
+
+@pytest.fixture(scope="session")
+def create_spark():
+    if 'spark' not in globals():
+        globals()['spark'] = cddp.create_spark_session()
+    return globals()['spark']
+
+def test_serialize_dataframe_formats(create_spark):
+    df = create_spark.sql("select id, cast(id * 1.5 as decimal(10, 2)) as price, date'2023-01-01' as day from range(3)")
+
+    records = serialization.serialize_dataframe(df, "records")
+    assert records[1] == {"id": 1, "price": 1.5, "day": "2023-01-01"}
+
+    columns = serialization.serialize_dataframe(df, "columns")
+    assert columns["id"] == [0, 1, 2]
+
+    ipc = serialization.serialize_dataframe(df, "arrow")
+    table = pa.ipc.open_stream(ipc).read_all()
+    assert table.num_rows == 3
+    assert table.column_names == ["id", "price", "day"]
+
+def test_serialize_dataframe_invalid_format(create_spark):
+    with pytest.raises(Exception, match="Invalid result format"):
+        serialization.serialize_dataframe(create_spark.range(1), "xml")
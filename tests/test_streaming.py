@@ -1,5 +1,6 @@
 import cddp
 import pytest
+import threading
 
 @pytest.fixture(scope="session")
 def create_spark():
@@ -18,4 +19,57 @@ def test_example_pipeline_fruit_streaming(create_spark):
             (4, 'Green Apple', 45.0),\
             (5, 'Fiji Apple', 56.0),\
             (6, 'Banana', 17.0),\
-            (7, 'Green Grape', 36.0)] == list
\ No newline at end of file
+            (7, 'Green Grape', 36.0)] == list
+
+
+def test_replayed_micro_batch_is_written_once(create_spark, tmp_path):
+    task = {"name": "replayed_batch", "output": {"target": "replayed_batch", "type": ["file"]}}
+    df = create_spark.range(3)
+    cddp.write_batch_to_sinks(df, task, str(tmp_path), "append", batch_id=0, query_id="query_a")
+    # the same micro-batch replayed after a restart
+    cddp.write_batch_to_sinks(df, task, str(tmp_path), "append", batch_id=0, query_id="query_a")
+    cddp.write_batch_to_sinks(df, task, str(tmp_path), "append", batch_id=1, query_id="query_a")
+    assert create_spark.read.format("delta").load(str(tmp_path / "data" / "replayed_batch")).count() == 6
+    # a reset checkpoint starts a new query, whose batch ids start again
+    cddp.write_batch_to_sinks(df, task, str(tmp_path), "append", batch_id=0, query_id="query_b")
+    assert create_spark.read.format("delta").load(str(tmp_path / "data" / "replayed_batch")).count() == 9
+
+
+def test_query_id_is_read_from_the_checkpoint(create_spark, tmp_path):
+    checkpoint = tmp_path / "chkpt"
+    query = create_spark.readStream.format("rate").load().writeStream.format("noop") \
+        .option("checkpointLocation", str(checkpoint)).trigger(once=True).start()
+    query.awaitTermination()
+    assert cddp.streaming.get_query_id(create_spark, str(checkpoint)) == query.id
+
+
+def test_concurrent_runs_track_their_own_queries():
+    class FakeQuery:
+        isActive = False
+    runs = {}
+
+    def run_pipeline(name):
+        run = cddp.streaming.begin_run()
+        cddp.streaming.register_query(FakeQuery(), {"name": name, "output": {}})
+        runs[name] = list(run["queries"])
+        cddp.streaming.end_run(run)
+
+    threads = [threading.Thread(target=run_pipeline, args=(name,)) for name in ["a", "b"]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert [item["task"]["name"] for item in runs["a"]] == ["a"]
+    assert [item["task"]["name"] for item in runs["b"]] == ["b"]
+    assert cddp.streaming.current_run.get() is None
+
+
+def test_invalid_triggers_are_rejected():
+    assert cddp.streaming.get_trigger_args({"availableNow": True}) == {"availableNow": True}
+    assert cddp.streaming.get_trigger_args({"processingTime": "10 seconds"}) == {"processingTime": "10 seconds"}
+    for trigger in [{"availableNow": False}, {"once": False}, {"once": "false"}, {"processingTime": 10}, {"processingTime": " "}]:
+        assert cddp.streaming.validate_trigger("task", trigger) != []
+        with pytest.raises(Exception, match="Invalid trigger"):
+            cddp.streaming.get_trigger_args(trigger)
+    for key in cddp.streaming.rate_limits:
+        assert cddp.streaming.validate_rate_limit("task", key, True) != []
@@ -0,0 +1,29 @@
+import cddp
+import cddp.task_code as task_code
+import pytest
+
+@pytest.fixture(scope="session")
+def create_spark():
+    if 'spark' not in globals():
+        globals()['spark'] = cddp.create_spark_session()
+    return globals()['spark']
+
+def test_python_task_code_is_compiled_once(create_spark):
+    task = {"name": "python_task", "code": {"lang": "python", "python": ["n = 3", "output_df = spark.range(n)"]}}
+    assert task_code.get_compiled_code(task) is task_code.get_compiled_code(dict(task))
+    df = cddp.run_task_code(create_spark, task)
+    assert df.count() == 3
+
+    task["code"]["python"] = "output_df = spark.range(5)"
+    assert cddp.run_task_code(create_spark, task).count() == 5
+
+def test_python_task_code_without_output_df(create_spark):
+    task = {"name": "python_task", "code": {"lang": "python", "python": "df = spark.range(3)"}}
+    with pytest.raises(Exception, match="does not set output_df"):
+        cddp.run_task_code(create_spark, task)
+
+def test_python_task_code_keeps_the_module_names(create_spark):
+    task = {"name": "python_task", "code": {"lang": "python", "python": [
+        "assert os.path.exists('.') and time.time() > 0 and DeltaTable is not None",
+        "output_df = spark.range(1)"]}}
+    assert task_code.run_python_code(create_spark, task).count() == 1